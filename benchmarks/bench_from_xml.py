@@ -0,0 +1,39 @@
+"""Measure how fast HighriseObject.from_xml turns parsed XML into objects.
+
+Run from a checkout with:
+
+    $ python benchmarks/bench_from_xml.py
+
+The XML is parsed once up front, so the numbers are for object
+construction alone."""
+
+from __future__ import print_function
+
+import os
+import sys
+import timeit
+from xml.etree import ElementTree
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fixtures
+from pyrise import Deal, Note, Person
+
+
+def bench(name, model, tag, document, repeat=5, number=5):
+    root = ElementTree.fromstring(document.encode('utf-8'))
+    elements = list(root.iter(tag))
+
+    def run():
+        for element in elements:
+            model.from_xml(element)
+
+    best = min(timeit.repeat(run, repeat=repeat, number=number)) / number
+    print('{:<28} {:>10,.0f} records/sec'.format(name, len(elements) / best))
+
+
+if __name__ == '__main__':
+    bench('people (500 per page)', Person, 'person', fixtures.people_page())
+    bench('deals (500 per page)', Deal, 'deal', fixtures.deals_page())
+    bench('notes (500 per page)', Note, 'note', fixtures.notes_page())
@@ -0,0 +1,130 @@
+"""Measure end-to-end request throughput against a local stub server.
+
+Run from a checkout with:
+
+    $ python benchmarks/bench_requests.py [--latency SECONDS] [--runs N] [--no-gzip]
+
+Each benchmark makes real HTTP requests to stub_server.StubServer, so
+the numbers include the connection pool, parsing and object
+construction, but not the network. --latency adds a delay to every
+response to approximate a real round trip, and --no-gzip sends bodies
+uncompressed.
+
+For each benchmark it prints records/sec built, requests/sec made,
+p50 and p99 latency per operation, and the peak memory allocated during
+one operation (Python 3 only, using tracemalloc)."""
+
+from __future__ import print_function
+
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+from pyrise import Deal, Highrise, Note, Person
+from stub_server import StubServer
+
+
+def percentile(timings, p):
+    """Return the p-th percentile of a sorted list of timings"""
+
+    index = int(round(p / 100.0 * (len(timings) - 1)))
+    return timings[index]
+
+
+def peak_memory(operation):
+    """Return the peak memory in bytes allocated while running operation"""
+
+    if tracemalloc is None:
+        return None
+    tracemalloc.start()
+    try:
+        operation()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def bench(server, name, operation, runs):
+    """Run operation runs times and print its numbers.
+
+    operation returns the number of records it built."""
+
+    # warm up the connection pool before timing anything
+    operation()
+
+    timings = []
+    records = 0
+    requests = server.requests
+    for _ in range(runs):
+        start = timeit.default_timer()
+        records += operation()
+        timings.append(timeit.default_timer() - start)
+    requests = server.requests - requests
+    total = sum(timings)
+    timings.sort()
+
+    peak = peak_memory(operation)
+    print('{:<30} {:>10} {:>10,.0f} {:>9.2f} {:>9.2f} {:>10}'.format(
+        name,
+        '{:,.0f}'.format(records / total) if records else '-',
+        requests / total,
+        percentile(timings, 50) * 1000,
+        percentile(timings, 99) * 1000,
+        'n/a' if peak is None else '{:,.0f} KB'.format(peak / 1024.0),
+    ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds to delay every response by')
+    parser.add_argument('--runs', type=int, default=20, help='times to run each list benchmark')
+    parser.add_argument('--people', type=int, default=2000, help='people for paginated listing to go through')
+    parser.add_argument('--no-gzip', action='store_true', help="don't compress response bodies")
+    args = parser.parse_args()
+
+    server = StubServer(people=args.people, latency=args.latency, gzip=not args.no_gzip)
+    Highrise.set_server(server.start())
+    Highrise.auth('benchmark')
+
+    person = Person.get(1)
+    ids = iter(range(1, 10 ** 9))
+
+    def get():
+        Person.get(next(ids) % args.people + 1)
+        return 1
+
+    def save():
+        person.title = 'Title {}'.format(next(ids))
+        person.save(refetch=False)
+        return 0
+
+    print('{:<30} {:>10} {:>10} {:>9} {:>9} {:>10}'.format(
+        '', 'records/s', 'requests/s', 'p50 ms', 'p99 ms', 'peak mem'))
+    try:
+        bench(server, '_list people (500 per page)',
+              lambda: len(Person._list('people.xml', 'person')), args.runs)
+        bench(server, '_list deals (500 per page)',
+              lambda: len(Deal._list('deals.xml', 'deal')), args.runs)
+        bench(server, '_list notes (100)',
+              lambda: len(Note._list('people/1/notes.xml', 'note')), args.runs)
+        bench(server, 'get person', get, args.runs * 10)
+        bench(server, 'save person', save, args.runs * 10)
+        bench(server, 'paginated people',
+              lambda: len(list(Person.all())), max(args.runs // 4, 1))
+        bench(server, 'paginated people (iterator)',
+              lambda: sum(1 for _ in Person.all().iterator()), max(args.runs // 4, 1))
+    finally:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
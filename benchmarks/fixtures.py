@@ -0,0 +1,174 @@
+"""Realistic Highrise XML payloads for the benchmarks.
+
+The documents mirror what the Highrise API actually sends back: pretty
+printed, with full contact data, custom field values and nested parties."""
+
+PERSON = '''  <person>
+    <id type="integer">{id}</id>
+    <first-name>First{id}</first-name>
+    <last-name>Last{id}</last-name>
+    <title>Regional Manager</title>
+    <background>Met at the {id} conference. Interested in the enterprise plan.</background>
+    <company-id type="integer">{company_id}</company-id>
+    <company-name>Company {company_id}</company-name>
+    <created-at type="datetime">2011-02-27T03:11:52Z</created-at>
+    <updated-at type="datetime">2012-03-10T15:11:{second:02d}Z</updated-at>
+    <visible-to>Everyone</visible-to>
+    <owner-id type="integer" nil="true"></owner-id>
+    <group-id type="integer" nil="true"></group-id>
+    <author-id type="integer">2</author-id>
+    <avatar_url>https://example.highrisehq.com/avatars/{id}.png</avatar_url>
+    <contact-data>
+      <email-addresses type="array">
+        <email-address>
+          <id type="integer">{id}1</id>
+          <address>first{id}@example.com</address>
+          <location>Work</location>
+        </email-address>
+        <email-address>
+          <id type="integer">{id}2</id>
+          <address>first{id}@home.example.com</address>
+          <location>Home</location>
+        </email-address>
+      </email-addresses>
+      <phone-numbers type="array">
+        <phone-number>
+          <id type="integer">{id}3</id>
+          <number>512-555-{phone:04d}</number>
+          <location>Work</location>
+        </phone-number>
+      </phone-numbers>
+      <addresses type="array">
+        <address>
+          <id type="integer">{id}4</id>
+          <city>Austin</city>
+          <country>United States</country>
+          <state>TX</state>
+          <street>{id} Congress Ave</street>
+          <zip>78701</zip>
+          <location>Work</location>
+        </address>
+      </addresses>
+      <instant-messengers type="array">
+      </instant-messengers>
+      <twitter-accounts type="array">
+        <twitter-account>
+          <id type="integer">{id}5</id>
+          <location>Personal</location>
+          <username>user{id}</username>
+        </twitter-account>
+      </twitter-accounts>
+      <web-addresses type="array">
+        <web-address>
+          <id type="integer">{id}6</id>
+          <url>http://example.com/{id}</url>
+          <location>Work</location>
+        </web-address>
+      </web-addresses>
+    </contact-data>
+    <subject_datas type="array">
+      <subject_data>
+        <id type="integer">{id}7</id>
+        <subject_field_id type="integer">1</subject_field_id>
+        <subject_field_label>Lead source</subject_field_label>
+        <value>Conference</value>
+      </subject_data>
+      <subject_data>
+        <id type="integer">{id}8</id>
+        <subject_field_id type="integer">2</subject_field_id>
+        <subject_field_label>Segment</subject_field_label>
+        <value>Enterprise</value>
+      </subject_data>
+    </subject_datas>
+  </person>
+'''
+
+DEAL = '''  <deal>
+    <id type="integer">{id}</id>
+    <account-id type="integer">1</account-id>
+    <author-id type="integer">2</author-id>
+    <background>Selling a whole bunch of ice to Eskimos.</background>
+    <category-id type="integer">3</category-id>
+    <created-at type="datetime">2011-02-27T03:11:52Z</created-at>
+    <updated-at type="datetime">2012-03-10T15:11:52Z</updated-at>
+    <currency>USD</currency>
+    <duration type="integer" nil="true"></duration>
+    <group-id type="integer" nil="true"></group-id>
+    <name>Deal {id}</name>
+    <owner-id type="integer" nil="true"></owner-id>
+    <party-id type="integer">{party_id}</party-id>
+    <price type="integer">{price}</price>
+    <price-type>fixed</price-type>
+    <responsible-party-id type="integer">2</responsible-party-id>
+    <status>pending</status>
+    <status-changed-on type="date" nil="true"></status-changed-on>
+    <visible-to>Everyone</visible-to>
+    <parties type="array">
+      <party>
+        <id type="integer">{party_id}</id>
+        <first-name>First{party_id}</first-name>
+        <last-name>Last{party_id}</last-name>
+        <type>Person</type>
+        <created-at type="datetime">2011-02-27T03:11:52Z</created-at>
+        <updated-at type="datetime">2012-03-10T15:11:52Z</updated-at>
+      </party>
+      <party>
+        <id type="integer">{company_id}</id>
+        <name>Company {company_id}</name>
+        <type>Company</type>
+        <created-at type="datetime">2011-02-27T03:11:52Z</created-at>
+        <updated-at type="datetime">2012-03-10T15:11:52Z</updated-at>
+      </party>
+    </parties>
+  </deal>
+'''
+
+NOTE = '''  <note>
+    <id type="integer">{id}</id>
+    <author-id type="integer">2</author-id>
+    <body>Called to follow up on the proposal. Note number {id}.</body>
+    <collection-id type="integer" nil="true"></collection-id>
+    <collection-type nil="true"></collection-type>
+    <created-at type="datetime">2011-02-27T03:11:52Z</created-at>
+    <group-id type="integer" nil="true"></group-id>
+    <owner-id type="integer" nil="true"></owner-id>
+    <subject-id type="integer">{subject_id}</subject-id>
+    <subject-type>Party</subject-type>
+    <subject-name>First{subject_id} Last{subject_id}</subject-name>
+    <updated-at type="datetime">2012-03-10T15:11:52Z</updated-at>
+    <visible-to>Everyone</visible-to>
+  </note>
+'''
+
+
+def person(id):
+    return PERSON.format(id=id, company_id=1000 + id % 50, second=id % 60, phone=id % 10000)
+
+
+def deal(id):
+    return DEAL.format(id=id, party_id=id + 1, company_id=1000 + id % 50, price=id * 100)
+
+
+def note(id, subject_id=1):
+    return NOTE.format(id=id, subject_id=subject_id)
+
+
+def people_page(start=1, count=500):
+    """Return a page of people, as sent for /people.xml"""
+
+    return '<?xml version="1.0" encoding="UTF-8"?>\n<people type="array">\n{}</people>\n'.format(
+        ''.join(person(id) for id in range(start, start + count)))
+
+
+def deals_page(start=1, count=500):
+    """Return a page of deals, as sent for /deals.xml"""
+
+    return '<?xml version="1.0" encoding="UTF-8"?>\n<deals type="array">\n{}</deals>\n'.format(
+        ''.join(deal(id) for id in range(start, start + count)))
+
+
+def notes_page(start=1, count=500, subject_id=1):
+    """Return a list of notes, as sent for /people/#{id}/notes.xml"""
+
+    return '<?xml version="1.0" encoding="UTF-8"?>\n<notes type="array">\n{}</notes>\n'.format(
+        ''.join(note(id, subject_id) for id in range(start, start + count)))
@@ -0,0 +1,182 @@
+"""A local stand-in for the Highrise API, serving the benchmark fixtures.
+
+It answers the requests the benchmarks make, from pre-rendered bytes so
+that the server costs as little as possible:
+
+    GET  /people.xml[?n=offset]     pages of people, 500 at a time
+    GET  /people/#{id}.xml          a single person
+    PUT  /people/#{id}.xml          200 with an empty body
+    POST /people.xml                201 with the new person
+    GET  /people/#{id}/notes.xml    a list of notes
+    GET  /deals.xml                 a page of deals
+    GET  /deals/#{id}.xml           a single deal
+
+Anything else is a 404. Bodies are gzipped for clients that accept it,
+as Highrise does, unless the server is created with gzip=False. Run it
+on its own with:
+
+    $ python benchmarks/stub_server.py 8000
+
+and point pyrise at it with Highrise.set_server('http://127.0.0.1:8000')."""
+
+from __future__ import print_function
+
+import re
+import sys
+import threading
+import time
+import zlib
+
+from six.moves import BaseHTTPServer, socketserver
+
+import fixtures
+
+XML_HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n'
+
+
+class StubServer(object):
+    """Serve the fixtures on 127.0.0.1 from a background thread.
+
+    people is the total number of people listed by /people.xml, latency
+    is a delay in seconds added to every response, gzip is whether to
+    compress bodies for clients that accept it, and requests counts the
+    requests served so far."""
+
+    page_size = 500
+
+    def __init__(self, people=2000, notes=100, latency=0.0, port=0, gzip=True):
+        self.latency = latency
+        self.gzip = gzip
+        self.requests = 0
+        self._lock = threading.Lock()
+
+        # render every response up front
+        self._people_pages = {}
+        for offset in range(0, people + 1, self.page_size):
+            count = min(self.page_size, people - offset)
+            self._people_pages[offset] = fixtures.people_page(offset + 1, count).encode('utf-8')
+        self._deals = fixtures.deals_page().encode('utf-8')
+        self._notes = fixtures.notes_page(count=notes).encode('utf-8')
+        self._compressed = {}
+
+        self._server = _ThreadingHTTPServer(('127.0.0.1', port), _Handler)
+        self._server.stub = self
+        self._thread = None
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{}'.format(self._server.server_address[1])
+
+    def start(self):
+        """Start serving in a daemon thread and return the server URL"""
+
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self.url
+
+    def stop(self):
+        """Stop serving and close the listening socket"""
+
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def respond(self, method, path):
+        """Return (status, body) for a request"""
+
+        with self._lock:
+            self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        path, _, query = path.partition('?')
+        offset = re.search(r'(?:^|&)n=(\d+)', query)
+        offset = int(offset.group(1)) if offset else 0
+
+        if path == '/people.xml':
+            if method == 'POST':
+                return 201, (XML_HEADER + fixtures.person(self.requests)).encode('utf-8')
+            empty = XML_HEADER.encode('utf-8') + b'<people type="array">\n</people>\n'
+            return 200, self._people_pages.get(offset, empty)
+
+        match = re.match(r'^/people/(\d+)\.xml$', path)
+        if match:
+            if method == 'PUT':
+                return 200, b''
+            return 200, (XML_HEADER + fixtures.person(int(match.group(1)))).encode('utf-8')
+
+        if re.match(r'^/people/\d+/notes\.xml$', path):
+            return 200, self._notes
+        if path == '/deals.xml':
+            return 200, self._deals
+
+        match = re.match(r'^/deals/(\d+)\.xml$', path)
+        if match:
+            return 200, (XML_HEADER + fixtures.deal(int(match.group(1)))).encode('utf-8')
+
+        return 404, b''
+
+    def compress(self, content):
+        """Return content gzipped, remembering the result for large pages
+        so that compressing them again isn't timed"""
+
+        compressed = self._compressed.get(content)
+        if compressed is None:
+            compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            compressed = compressor.compress(content) + compressor.flush()
+            if len(content) > 64 * 1024:
+                self._compressed[content] = compressed
+        return compressed
+
+
+class _ThreadingHTTPServer(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+
+class _Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    # keep connections alive, like Highrise does, without waiting to
+    # coalesce the headers and body into one packet
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def handle_method(self, method):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+        stub = self.server.stub
+        status, content = stub.respond(method, self.path)
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/xml; charset=utf-8')
+        if content and stub.gzip and 'gzip' in (self.headers.get('Accept-Encoding') or ''):
+            content = stub.compress(content)
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def do_GET(self):
+        self.handle_method('GET')
+
+    def do_PUT(self):
+        self.handle_method('PUT')
+
+    def do_POST(self):
+        self.handle_method('POST')
+
+    def do_DELETE(self):
+        self.handle_method('DELETE')
+
+    def log_message(self, format, *args):
+        pass
+
+
+if __name__ == '__main__':
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8000
+    server = StubServer(port=port)
+    print('Serving Highrise fixtures on {}'.format(server.url))
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
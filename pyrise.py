@@ -1,41 +1,1374 @@
 from __future__ import unicode_literals
+import calendar
+import copy
+import functools
+import io
+import itertools
+import json
+import logging
+import os
+import random
 import re
+import sqlite3
 import sys
+import threading
+import time
+import weakref
+from collections import OrderedDict
 from datetime import datetime, timedelta
+from email.utils import mktime_tz, parsedate_tz
+from multiprocessing.pool import ThreadPool
 from xml.etree import ElementTree
 
 import requests
+from requests.adapters import HTTPAdapter
 
-from six import text_type
+from six import add_metaclass, integer_types, string_types, text_type
+from six.moves import queue
 from six.moves.urllib.parse import quote
 
 
+def _aio():
+    """Import the asyncio support module on first use. It is kept
+    separate because it needs Python 3 and aiohttp."""
+
+    import pyrise_async
+    return pyrise_async
+
+
+def _concurrent_call(func):
+    """Wrap func to return a (result, exception) pair rather than raise,
+    running with the caller's client and identity map, if it has them,
+    for use in worker threads"""
+
+    client = Client.current()
+    identity_map = IdentityMap.current()
+
+    def run(item):
+        if identity_map is None:
+            return func(item)
+        with identity_map:
+            return func(item)
+
+    def call(item):
+        try:
+            if client is None:
+                return run(item), None
+            with client:
+                return run(item), None
+        except Exception as e:
+            return None, e
+
+    return call
+
+
+def _map_concurrent(func, items, concurrency):
+    """Call func on each item using a pool of up to concurrency threads.
+
+    Returns a (result, exception) pair for each item, in the same order
+    as items, so that one failure doesn't abort the rest."""
+
+    call = _concurrent_call(func)
+    items = list(items)
+    if concurrency <= 1 or len(items) <= 1:
+        return [call(item) for item in items]
+
+    pool = ThreadPool(min(concurrency, len(items)))
+    try:
+        return pool.map(call, items)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def _imap_concurrent(func, items, concurrency):
+    """Like _map_concurrent, but a generator that yields an (item, result,
+    exception) tuple for each item as soon as its call finishes.
+
+    Items are read from the iterable as calls finish, with at most two
+    per thread in flight, so a long or endless iterable isn't read into
+    memory up front."""
+
+    call = _concurrent_call(func)
+
+    def run(item):
+        result, error = call(item)
+        return item, result, error
+
+    if concurrency <= 1:
+        for item in items:
+            yield run(item)
+        return
+
+    pool = ThreadPool(concurrency)
+    finished = queue.Queue()
+    items = iter(items)
+
+    def submit(count):
+        submitted = 0
+        for item in itertools.islice(items, count):
+            pool.apply_async(run, (item,), callback=finished.put)
+            submitted += 1
+        return submitted
+
+    try:
+        in_flight = submit(2 * concurrency)
+        while in_flight:
+            outcome = finished.get()
+            # start the next call before handing this result back
+            in_flight += submit(1) - 1
+            yield outcome
+        pool.close()
+    finally:
+        # if the caller stopped early, don't start any more calls
+        pool.terminate()
+        pool.join()
+
+
+# a monotonic clock where available, for measuring waits
+_clock = getattr(time, 'monotonic', time.time)
+
+
+def _retry_after(value):
+    """Convert a Retry-After header (seconds or an HTTP date) to seconds"""
+
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        parsed = parsedate_tz(value)
+        if parsed is None:
+            return None
+        return max(mktime_tz(parsed) - time.time(), 0.0)
+
+
+def _xml_bytes(xml):
+    """Return the UTF-8 encoded bytes to send for an XML element"""
+
+    return ElementTree.tostring(xml, encoding='utf-8')
+
+
+def _parse_xml(r, streamed):
+    """Parse the XML body of a response. A streamed body is parsed as it
+    arrives, decompressing it on the way, instead of being read into
+    memory first."""
+
+    if not streamed:
+        return ElementTree.fromstring(r.content)
+    parser = ElementTree.XMLParser()
+    r.raw.decode_content = True
+    for chunk in iter(functools.partial(r.raw.read, 64 * 1024), b''):
+        parser.feed(chunk)
+    return parser.close()
+
+
+def _received_bytes(r):
+    """Return the size of a response body as it came over the wire, which
+    is smaller than its content if it was compressed"""
+
+    tell = getattr(r.raw, 'tell', None)
+    return (tell() if tell is not None else 0) or len(r.content)
+
+
 def _utf8_helper(value):
+    if not isinstance(value, (text_type, bytes)):
+        value = text_type(value)
     if isinstance(value, text_type):
         value = value.encode('utf-8')
     return quote(value)
 
 
+class _PoolStats(object):
+    """Thread-safe request and connection counters for a connection pool"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.connections = 0
+
+    def add_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def add_connection(self):
+        with self._lock:
+            self.connections += 1
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'hits': max(self.requests - self.connections, 0),
+                'misses': self.connections,
+            }
+
+
+class _PooledAdapter(HTTPAdapter):
+    """A requests adapter that counts the connections its pools open"""
+
+    def __init__(self, stats, **kwargs):
+        self._stats = stats
+        super(_PooledAdapter, self).__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super(_PooledAdapter, self).init_poolmanager(*args, **kwargs)
+        classes = self.poolmanager.pool_classes_by_scheme
+        self.poolmanager.pool_classes_by_scheme = dict(
+            (scheme, self._counting_pool(pool_cls)) for scheme, pool_cls in classes.items()
+        )
+
+    def _counting_pool(self, pool_cls):
+        stats = self._stats
+        connection_cls = pool_cls.ConnectionCls
+
+        class CountingConnection(connection_cls):
+            def connect(self):
+                stats.add_connection()
+                return connection_cls.connect(self)
+
+        return type(str(pool_cls.__name__), (pool_cls,), {'ConnectionCls': CountingConnection})
+
+    def send(self, request, **kwargs):
+        self._stats.add_request()
+        return super(_PooledAdapter, self).send(request, **kwargs)
+
+
+class Transport(object):
+    """The interface Highrise uses to send HTTP requests.
+
+    request() is called like requests.Session.request, with the full URL
+    and the keyword arguments auth (a (token, password) tuple), data,
+    headers and stream, plus anything passed to Highrise.request. It
+    must return an object with status_code, headers, content and text,
+    and for stream=True requests a file-like raw attribute to read the
+    body from and a close() method."""
+
+    def request(self, method, url, **kwargs):
+        raise NotImplementedError
+
+    def close(self):
+        """Release anything the transport holds open"""
+
+        pass
+
+
+class RequestsTransport(Transport):
+    """Send requests with the requests library, through the connection
+    pool of the client making the request (see Client.configure_pool),
+    or through session if one is given"""
+
+    def __init__(self, session=None):
+        self._session = session
+
+    def request(self, method, url, **kwargs):
+        session = self._session if self._session is not None else Highrise.session()
+        return session.request(method, url, **kwargs)
+
+    def close(self):
+        # a client's own pool is closed by the client
+        if self._session is not None:
+            self._session.close()
+
+
+class RequestScheduler(object):
+    """Client-side scheduler for requests to Highrise.
+
+    Requests are throttled by a token bucket that refills at rate
+    requests every per seconds (Highrise allows 500 requests per 10
+    seconds by default) and holds up to burst tokens. Requests that fail
+    with 502 or 503 are retried with jittered exponential backoff, or
+    after the server's Retry-After delay if it sent one, but only for
+    the methods in retry_methods (the idempotent ones by default). A
+    Retry-After holds back every request, even when the one that got it
+    isn't retried."""
+
+    def __init__(self, rate=500, per=10.0, burst=None, max_retries=3, backoff=0.5,
+                 max_backoff=30.0, retry_methods=('GET', 'PUT', 'DELETE')):
+        self.rate = rate
+        self.per = float(per)
+        self.burst = burst if burst is not None else rate
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.retry_methods = retry_methods
+
+        self._lock = threading.Lock()
+        self._tokens = float(self.burst)
+        self._updated = _clock()
+        self._paused_until = 0.0
+
+        self._queue_depth = 0
+        self._max_queue_depth = 0
+        self._requests = 0
+        self._retries = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    def _reserve(self):
+        """Take a token if one is available and return 0, otherwise
+        return the number of seconds to wait before trying again"""
+
+        with self._lock:
+            now = _clock()
+            if now < self._paused_until:
+                return self._paused_until - now
+
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate / self.per)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0
+            return (1 - self._tokens) * self.per / self.rate
+
+    def _enqueue(self):
+        with self._lock:
+            self._queue_depth += 1
+            self._max_queue_depth = max(self._max_queue_depth, self._queue_depth)
+
+    def _dequeue(self, waited):
+        with self._lock:
+            self._queue_depth -= 1
+            self._requests += 1
+            self._total_wait += waited
+            self._max_wait = max(self._max_wait, waited)
+
+    def acquire(self):
+        """Block until the scheduler allows another request, and return
+        the number of seconds spent waiting"""
+
+        start = _clock()
+        self._enqueue()
+        try:
+            delay = self._reserve()
+            while delay:
+                time.sleep(delay)
+                delay = self._reserve()
+        finally:
+            waited = _clock() - start
+            self._dequeue(waited)
+
+        return waited
+
+    def retry_delay(self, method, error, attempt):
+        """Return how long to wait before retrying a request that raised
+        error on the given (zero-based) attempt, or None if it shouldn't
+        be retried"""
+
+        if not isinstance(error, (GatewayConnectionError, ServiceUnavailable)):
+            return None
+
+        with self._lock:
+            # the server told us how long to back off, so hold every
+            # request, whether or not this one is retried
+            retry_after = getattr(error, 'retry_after', None)
+            if retry_after is not None:
+                self._paused_until = max(self._paused_until, _clock() + retry_after)
+
+            if method not in self.retry_methods or attempt >= self.max_retries:
+                return None
+            self._retries += 1
+            if retry_after is not None:
+                return retry_after
+
+        delay = min(self.backoff * (2 ** attempt), self.max_backoff)
+        return random.uniform(delay / 2, delay)
+
+    def call(self, method, send):
+        """Make a request by calling send() once the scheduler allows it,
+        retrying as needed, and return its result"""
+
+        attempt = 0
+        while True:
+            self.acquire()
+            try:
+                return send()
+            except ElevatorError as e:
+                delay = self.retry_delay(method, e, attempt)
+                if delay is None:
+                    raise
+                attempt += 1
+                time.sleep(delay)
+
+    def stats(self):
+        """Return queue depth, wait time and retry statistics"""
+
+        with self._lock:
+            return {
+                'queue_depth': self._queue_depth,
+                'max_queue_depth': self._max_queue_depth,
+                'requests': self._requests,
+                'retries': self._retries,
+                'total_wait': self._total_wait,
+                'max_wait': self._max_wait,
+                'average_wait': self._total_wait / self._requests if self._requests else 0.0,
+            }
+
+
+class ValidatorCache(object):
+    """A cache of parsed GET responses that are revalidated with Highrise
+    using their ETag and Last-Modified headers.
+
+    When a cached URL is requested again, the request is made with
+    If-None-Match / If-Modified-Since, and if Highrise answers 304 Not
+    Modified the XML parsed last time is returned without reading or
+    parsing a body. Holds up to max_entries responses, evicting the
+    least recently used."""
+
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, key):
+        """Return the (etag, last_modified, xml) entry for key, or None"""
+
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._entries[key] = entry
+            return entry
+
+    def conditional_headers(self, entry):
+        """Return the headers that revalidate a cached entry"""
+
+        etag, last_modified, xml = entry
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        return headers
+
+    def not_modified(self, entry):
+        """Record a 304 response and return the cached XML"""
+
+        with self._lock:
+            self._hits += 1
+        return entry[2]
+
+    def store(self, key, headers, xml):
+        """Record a full response, caching it if it has validators"""
+
+        etag = headers.get('ETag')
+        last_modified = headers.get('Last-Modified')
+        with self._lock:
+            self._misses += 1
+            self._entries.pop(key, None)
+            if etag or last_modified:
+                self._entries[key] = (etag, last_modified, xml)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+
+    def invalidate(self, key=None):
+        """Forget the entry for key, or every entry if key is None"""
+
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self):
+        """Return hit (304 Not Modified) and miss (full response) counts"""
+
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self._hits, 'misses': self._misses}
+
+
+class ReferenceCache(object):
+    """An in-process cache for reference data that rarely changes, like
+    users, tags and custom fields.
+
+    Entries expire ttl seconds after they are stored, and once there are
+    more than max_entries the least recently used are evicted. Any object
+    with the same get/set/delete/clear methods can be used instead, to
+    share the cache between processes for instance."""
+
+    def __init__(self, ttl=300, max_entries=1000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, key):
+        """Return the cached value for key, or None"""
+
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None or entry[0] < _clock():
+                self._misses += 1
+                return None
+            self._entries[key] = entry
+            self._hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        """Cache value under key"""
+
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (_clock() + self.ttl, value)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        """Forget the value cached under key"""
+
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """Forget everything"""
+
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Return hit and miss counts"""
+
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self._hits, 'misses': self._misses}
+
+
+# path segments that are ids, and query string values, for _endpoint
+_ID_SEGMENT = re.compile(r'/\d+(?=[/.]|$)')
+_QUERY_VALUE = re.compile(r'([^&=]+)=[^&]*')
+
+
+def _endpoint(path):
+    """Return the endpoint template for a request path, with ids replaced
+    by {id} and query values by their names, e.g. /people/{id}/notes.xml
+    or /people.xml?tag_id={tag_id}"""
+
+    path, _, query = path.partition('?')
+    endpoint = _ID_SEGMENT.sub('/{id}', '/' + path.strip('/'))
+    if query:
+        endpoint += '?' + _QUERY_VALUE.sub(r'\1={\1}', query)
+    return endpoint
+
+
+
+class CallRecord(object):
+    """Timings and sizes for one request to Highrise, as passed to the
+    sinks added with Highrise.add_sink.
+
+    Times are in seconds: wait_time is spent waiting for the scheduler
+    (including retries), network_time sending the request and receiving
+    the response, parse_time parsing the XML and construct_time building
+    objects from it (or, for a save, building the XML that is sent).
+    Response bodies are read while they are parsed, so that time is
+    counted as parse_time. response_bytes is the size of the body as it
+    was received, before decompression. error is the exception the
+    request raised, if any."""
+
+    def __init__(self, method, path):
+        self.method = method
+        self.path = path
+        self.endpoint = _endpoint(path)
+        self.status = None
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.wait_time = 0.0
+        self.network_time = 0.0
+        self.parse_time = 0.0
+        self.construct_time = 0.0
+        self.error = None
+
+    def __repr__(self):
+        return '<CallRecord {} {} {} {:.3f}s>'.format(self.method, self.endpoint, self.status, self.total_time)
+
+    @property
+    def total_time(self):
+        return self.wait_time + self.network_time + self.parse_time + self.construct_time
+
+    def as_dict(self):
+        return {
+            'method': self.method,
+            'endpoint': self.endpoint,
+            'path': self.path,
+            'status': self.status,
+            'request_bytes': self.request_bytes,
+            'response_bytes': self.response_bytes,
+            'wait_time': self.wait_time,
+            'network_time': self.network_time,
+            'parse_time': self.parse_time,
+            'construct_time': self.construct_time,
+            'total_time': self.total_time,
+            'error': None if self.error is None else type(self.error).__name__,
+        }
+
+
+class _CallScope(object):
+    """The requests made by one instrumented model method, which are
+    reported once it has finished building objects from them"""
+
+    def __init__(self):
+        self.records = []
+        self.child_time = 0.0
+
+    def finish(self, elapsed):
+        # whatever time wasn't spent on requests or nested methods was
+        # spent building objects from the last response
+        if self.records:
+            busy = sum(record.total_time for record in self.records)
+            self.records[-1].construct_time += max(elapsed - self.child_time - busy, 0.0)
+        for record in self.records:
+            _emit(record)
+
+
+class _CallState(threading.local):
+    """The instrumented methods running in each thread, and the record of
+    the streamed response whose objects are being built, if any"""
+
+    def __init__(self):
+        self.scopes = []
+        self.current = None
+
+
+_calls = _CallState()
+
+
+def _instrumented(func):
+    """Decorate a model method that makes requests and builds objects from
+    the responses, so the time it spends building them is reported as
+    the requests' construct_time"""
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not Highrise._sinks:
+            return func(*args, **kwargs)
+
+        scopes = _calls.scopes
+        scope = _CallScope()
+        scopes.append(scope)
+        start = _clock()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            scopes.pop()
+            elapsed = _clock() - start
+            scope.finish(elapsed)
+            if scopes:
+                scopes[-1].child_time += elapsed
+
+    return wrapper
+
+
+def _report(record):
+    """Send a finished request's record to the sinks, or hold it until the
+    instrumented method that made it has built its objects"""
+
+    if _calls.scopes:
+        _calls.scopes[-1].records.append(record)
+    else:
+        _emit(record)
+
+
+def _emit(record):
+    for sink in list(Highrise._sinks):
+        sink(record)
+
+
+class MetricsRegistry(object):
+    """A sink that keeps Prometheus-style histograms of request times by
+    endpoint, method and phase (wait, network, parse and construct),
+    along with counters of requests by status and of bytes sent and
+    received. render() returns them in the Prometheus text format."""
+
+    buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+    phases = ('wait', 'network', 'parse', 'construct')
+
+    def __init__(self, buckets=None, prefix='pyrise'):
+        if buckets is not None:
+            self.buckets = tuple(sorted(buckets))
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._histograms = OrderedDict()
+        self._requests = OrderedDict()
+        self._bytes = OrderedDict()
+
+    def __call__(self, record):
+        labels = (('endpoint', record.endpoint), ('method', record.method))
+        status = record.status if record.status is not None else type(record.error).__name__
+
+        with self._lock:
+            for phase in self.phases:
+                self._observe(labels + (('phase', phase),), getattr(record, phase + '_time'))
+            self._count(self._requests, labels + (('status', status),), 1)
+            self._count(self._bytes, labels + (('direction', 'sent'),), record.request_bytes)
+            self._count(self._bytes, labels + (('direction', 'received'),), record.response_bytes)
+
+    def _observe(self, labels, value):
+        histogram = self._histograms.get(labels)
+        if histogram is None:
+            histogram = self._histograms[labels] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                histogram['buckets'][i] += 1
+                break
+        histogram['sum'] += value
+        histogram['count'] += 1
+
+    @staticmethod
+    def _count(counters, labels, value):
+        counters[labels] = counters.get(labels, 0) + value
+
+    def render(self):
+        """Return every metric in the Prometheus text exposition format"""
+
+        name = self.prefix + '_request_seconds'
+        lines = [
+            '# HELP {} Time spent on requests to Highrise, by phase'.format(name),
+            '# TYPE {} histogram'.format(name),
+        ]
+        with self._lock:
+            for labels, histogram in self._histograms.items():
+                cumulative = 0
+                for bound, count in zip(self.buckets, histogram['buckets']):
+                    cumulative += count
+                    lines.append('{}_bucket{} {}'.format(name, _labels(labels + (('le', repr(bound)),)), cumulative))
+                lines.append('{}_bucket{} {}'.format(name, _labels(labels + (('le', '+Inf'),)), histogram['count']))
+                lines.append('{}_sum{} {!r}'.format(name, _labels(labels), histogram['sum']))
+                lines.append('{}_count{} {}'.format(name, _labels(labels), histogram['count']))
+
+            for suffix, help_text, counters in (
+                    ('_requests_total', 'Requests to Highrise, by status', self._requests),
+                    ('_bytes_total', 'Bytes of XML sent to and received from Highrise', self._bytes)):
+                lines.append('# HELP {}{} {}'.format(self.prefix, suffix, help_text))
+                lines.append('# TYPE {}{} counter'.format(self.prefix, suffix))
+                for labels, value in counters.items():
+                    lines.append('{}{}{} {}'.format(self.prefix, suffix, _labels(labels), value))
+
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(labels):
+    """Format Prometheus labels"""
+
+    return '{' + ','.join('{}="{}"'.format(key, text_type(value).replace('\\', '\\\\').replace('"', '\\"'))
+                          for key, value in labels) + '}'
+
+
+class SlowCallLog(object):
+    """A sink that logs every request that took threshold seconds or more,
+    with all of its timings in the log record's highrise_call attribute
+    for structured log handlers"""
+
+    def __init__(self, threshold=1.0, logger=None):
+        self.threshold = threshold
+        self.logger = logger if logger is not None else logging.getLogger('pyrise')
+
+    def __call__(self, record):
+        if record.total_time < self.threshold:
+            return
+        self.logger.warning(
+            'slow Highrise request: %s %s took %.3fs (wait %.3fs, network %.3fs, parse %.3fs, construct %.3fs)',
+            record.method, record.endpoint, record.total_time, record.wait_time,
+            record.network_time, record.parse_time, record.construct_time,
+            extra={'highrise_call': record.as_dict()},
+        )
+
+
+class _ClientState(threading.local):
+    """The stack of clients active in each thread"""
+
+    def __init__(self):
+        self.stack = []
+
+
+_clients = _ClientState()
+
+
+class _SchedulerState(threading.local):
+    """The scheduler for the requests a bulk operation makes in each
+    thread, when their client doesn't have one"""
+
+    def __init__(self):
+        self.current = None
+
+
+_schedulers = _SchedulerState()
+
+
+class Client(object):
+    """A connection to one Highrise account, with its own credentials,
+    server, connection pool, transport, scheduler, caches and mirror.
+
+    Use it as a context manager to make every request in the block, in
+    this thread, go through it instead of the default client that
+    Highrise.auth and the other Highrise settings configure:
+
+        with Client(token, 'acme'):
+            people = Person.all()
+
+    Objects and QuerySets remember the client they were loaded or
+    created with and keep using it, even outside the block. Model.using
+    binds a model to a client without a block."""
+
+    def __init__(self, token=None, server=None, pool_size=10, max_per_host=10, keep_alive=True, block=False):
+        self.token = token
+        self._server = None
+        if server is not None:
+            self.set_server(server)
+        self._session = None
+        self._session_lock = threading.Lock()
+        self._pool_stats = _PoolStats()
+        self._pool_settings = {
+            'pool_size': pool_size,
+            'max_per_host': max_per_host,
+            'keep_alive': keep_alive,
+            'block': block,
+        }
+        self._transport = RequestsTransport()
+        self._scheduler = None
+        self._validator_cache = None
+        self._reference_cache = None
+        self._mirror = None
+
+    def __repr__(self):
+        return '<Client {}>'.format(self._server)
+
+    def __enter__(self):
+        _clients.stack.append(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        _clients.stack.pop()
+
+    @classmethod
+    def current(cls):
+        """Return the client active in this thread, or None"""
+
+        stack = _clients.stack
+        return stack[-1] if stack else None
+
+    def auth(self, token):
+        """Define the settings used to connect to Highrise"""
+
+        self.token = token
+
+    def set_server(self, server):
+        """Define the server to be used for API requests"""
+
+        if server[:4] == 'http':
+            self._server = server.strip('/')
+        else:
+            self._server = "https://{}.highrisehq.com".format(server)
+
+    def configure_pool(self, pool_size=10, max_per_host=10, keep_alive=True, block=False):
+        """Configure the HTTP connection pool shared by this client's requests.
+
+        pool_size is the number of hosts to keep connection pools for,
+        max_per_host is the number of keep-alive connections kept open
+        per host, and block makes callers wait for a free connection
+        rather than opening extra, unpooled ones. Any existing pool is
+        closed and a new one is created on the next request."""
+
+        self._pool_settings = {
+            'pool_size': pool_size,
+            'max_per_host': max_per_host,
+            'keep_alive': keep_alive,
+            'block': block,
+        }
+        self.close_pool()
+        self._pool_stats = _PoolStats()
+
+    def close_pool(self):
+        """Close all pooled connections"""
+
+        with self._session_lock:
+            session, self._session = self._session, None
+        if session is not None:
+            session.close()
+
+    def session(self):
+        """Return the pooled requests session, creating it if needed"""
+
+        with self._session_lock:
+            if self._session is None:
+                settings = self._pool_settings
+                adapter = _PooledAdapter(
+                    self._pool_stats,
+                    pool_connections=settings['pool_size'],
+                    pool_maxsize=settings['max_per_host'],
+                    pool_block=settings['block'],
+                )
+                session = requests.Session()
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                if not settings['keep_alive']:
+                    session.headers['Connection'] = 'close'
+                self._session = session
+            return self._session
+
+    def set_transport(self, transport):
+        """Send every request through a Transport, e.g. a FakeHighrise
+        from pyrise_fake, or pass None to go back to the requests library"""
+
+        self._transport = transport if transport is not None else RequestsTransport()
+
+    def pool_stats(self):
+        """Return hit/miss counts for the connection pool.
+
+        A hit is a request that reused an open keep-alive connection,
+        a miss is one that had to open a new connection (and pay for a
+        fresh TCP and TLS handshake)."""
+
+        return self._pool_stats.as_dict()
+
+    def set_scheduler(self, scheduler):
+        """Send every request through a RequestScheduler, or pass None to
+        stop scheduling requests"""
+
+        self._scheduler = scheduler
+
+    def set_validator_cache(self, cache):
+        """Revalidate GET requests against a ValidatorCache, or pass None
+        to stop caching"""
+
+        self._validator_cache = cache
+
+    def set_reference_cache(self, cache):
+        """Cache users, tags and custom fields in a ReferenceCache (or
+        anything with the same interface), or pass None to stop caching"""
+
+        self._reference_cache = cache
+
+    def set_mirror(self, mirror):
+        """Answer filter() queries from a SQLiteMirror while it is fresh,
+        or pass None to always ask Highrise"""
+
+        self._mirror = mirror
+
+    def _mirrored(self, model, **kwargs):
+        """Return the mirror's answer to a filter() query, or None if
+        there is no fresh mirror that can answer it"""
+
+        mirror = self._mirror
+        if mirror is None:
+            return None
+        return mirror.filter(model, **kwargs)
+
+    def _send(self, method, send):
+        """Call send() to make a request, through the scheduler if one is set"""
+
+        scheduler = self._scheduler
+        if scheduler is None:
+            scheduler = _schedulers.current
+            if scheduler is None:
+                return send()
+        return scheduler.call(method, send)
+
+    def request(self, path, method='GET', xml=None, hooks=None, **request_kwargs):
+        """Process an arbitrary request to Highrise.
+
+        Ordinarily, you shouldn't have to call this method directly,
+        but it's available to send arbitrary requests if needed."""
+
+        if not Highrise._sinks:
+            return self._request(None, path, method, xml, hooks, **request_kwargs)
+
+        # time the request for the sinks
+        record = CallRecord(method, path)
+        start = _clock()
+        try:
+            return self._request(record, path, method, xml, hooks, **request_kwargs)
+        except Exception as e:
+            record.error = e
+            raise
+        finally:
+            record.wait_time = max(_clock() - start - record.network_time - record.parse_time, 0.0)
+            _report(record)
+
+    def _request(self, record, path, method, xml, hooks, **request_kwargs):
+        """Make a request for request(), filling in record if it isn't None"""
+
+        # build the base request URL
+        url = '{}/{}'.format(self._server, path.strip('/'))
+
+        # make the request, asking for a compressed response
+        kwargs = {'auth': (self.token, 'X')}
+        kwargs.update(request_kwargs)
+        kwargs['headers'] = headers = {'Accept-Encoding': 'gzip, deflate'}
+
+        if xml:
+            if isinstance(xml, text_type):
+                xml = xml.encode('utf-8')
+            kwargs['data'] = xml
+            headers['Content-Type'] = 'application/xml; charset=utf-8'
+        headers.update(request_kwargs.get('headers') or {})
+
+        # parse GET and POST responses as they arrive, unless a response
+        # hook might want to read the body first
+        streamed = method in ('GET', 'POST') and not (hooks and 'response' in hooks)
+        kwargs['stream'] = streamed
+
+        # ask Highrise to only send the body if it changed since we cached it
+        cache = self._validator_cache
+        cached = None
+        if cache is not None:
+            cache_key = (self.token, url)
+            if method == 'GET':
+                cached = cache.get(cache_key)
+            if cached is not None:
+                headers = dict(kwargs.get('headers') or {})
+                headers.update(cache.conditional_headers(cached))
+                kwargs['headers'] = headers
+
+        def send():
+            start = _clock()
+            with self:
+                # a RequestsTransport uses the current client's pool
+                r = self._transport.request(method, url, **kwargs)
+            if record is not None:
+                record.network_time += _clock() - start
+                record.status = r.status_code
+                record.request_bytes = len(xml or b'')
+                if not streamed:
+                    record.response_bytes = _received_bytes(r)
+
+            # raise appropriate exceptions if there is an error
+            try:
+                Highrise._raise_for_status(r)
+            except ElevatorError:
+                if record is not None:
+                    record.response_bytes = _received_bytes(r)
+                r.close()
+                raise
+            return r
+
+        r = self._send(method, send)
+
+        if hooks and 'response' in hooks:
+            hooks['response'](r)
+
+        # if this was a PUT or DELETE request, return status (hopefully success)
+        if method in ('PUT', 'DELETE'):
+            if cache is not None:
+                cache.invalidate(cache_key)
+            return r.status_code
+
+        try:
+            # if nothing changed, reuse what we parsed last time
+            if cached is not None and r.status_code == 304:
+                return cache.not_modified(cached)
+
+            # for GET and POST requests, return the XML response
+            start = _clock()
+            try:
+                response = _parse_xml(r, streamed)
+            except ElementTree.ParseError:
+                raise UnexpectedResponse("The server sent back something that wasn't valid XML.")
+            if record is not None:
+                record.parse_time = _clock() - start
+                record.response_bytes = _received_bytes(r)
+        finally:
+            r.close()
+
+        if cache is not None and method == 'GET':
+            cache.store(cache_key, r.headers, response)
+        return response
+
+    def arequest(self, path, method='GET', xml=None, hooks=None, **request_kwargs):
+        """Coroutine version of request()"""
+
+        return _aio().client_request(self, path, method=method, xml=xml, hooks=hooks, **request_kwargs)
+
+    def iterparse(self, path, tag, hooks=None, **request_kwargs):
+        """Stream a GET request to Highrise, parsing the response
+        incrementally as it arrives.
+
+        Yields each top-level element with the given tag as soon as it
+        is complete. Elements are discarded once the caller moves on to
+        the next one, so memory use stays flat however large the
+        response is."""
+
+        # nothing is requested until the first element is needed
+        elements = self._iterparse_request(path, tag, hooks, **request_kwargs)
+        try:
+            for elem in elements:
+                yield elem
+        finally:
+            elements.close()
+
+    def _iterparse_request(self, path, tag, hooks, **request_kwargs):
+        """Make the request for iterparse(), and return a generator that parses it"""
+
+        # build the base request URL
+        url = '{}/{}'.format(self._server, path.strip('/'))
+
+        # make the request without reading the body, asking for it compressed
+        kwargs = {'auth': (self.token, 'X')}
+        kwargs.update(request_kwargs)
+        kwargs['headers'] = {'Accept-Encoding': 'gzip, deflate'}
+        kwargs['headers'].update(request_kwargs.get('headers') or {})
+        kwargs['stream'] = True
+
+        record = CallRecord('GET', path) if Highrise._sinks else None
+        started = _clock()
+
+        def send():
+            start = _clock()
+            with self:
+                # a RequestsTransport uses the current client's pool
+                r = self._transport.request('GET', url, **kwargs)
+            if record is not None:
+                record.network_time += _clock() - start
+                record.status = r.status_code
+            try:
+                Highrise._raise_for_status(r)
+            except ElevatorError:
+                r.close()
+                raise
+            return r
+
+        try:
+            r = self._send('GET', send)
+        except Exception as e:
+            if record is not None:
+                record.error = e
+                record.wait_time = max(_clock() - started - record.network_time, 0.0)
+                _emit(record)
+            raise
+        if record is not None:
+            record.wait_time = max(_clock() - started - record.network_time, 0.0)
+            return self._iterparse_timed(r, tag, hooks, record)
+        return self._iterparse(r, tag, hooks)
+
+    def _iterparse(self, r, tag, hooks):
+        """Parse a streamed response for iterparse()"""
+
+        try:
+            if hooks and 'response' in hooks:
+                hooks['response'](r)
+
+            # parse the body as it streams in, tracking how deep we are
+            # so only direct children of the root element are yielded
+            r.raw.decode_content = True
+            depth = 0
+            root = None
+            try:
+                for event, elem in ElementTree.iterparse(r.raw, events=('start', 'end')):
+                    if event == 'start':
+                        if root is None:
+                            root = elem
+                        depth += 1
+                        continue
+
+                    depth -= 1
+                    if depth <= 1 and elem.tag == tag:
+                        yield elem
+                        root.clear()
+            except ElementTree.ParseError:
+                raise UnexpectedResponse("The server sent back something that wasn't valid XML.")
+        finally:
+            r.close()
+
+    def _iterparse_timed(self, r, tag, hooks, record):
+        """Parse a streamed response for iterparse(), timing the parsing
+        (and reading) for record and reporting it once finished"""
+
+        elements = self._iterparse(r, tag, hooks)
+        try:
+            while True:
+                start = _clock()
+                try:
+                    elem = next(elements)
+                except StopIteration:
+                    return
+                finally:
+                    record.parse_time += _clock() - start
+
+                # let the caller add the time it takes to build an object
+                _calls.current = record
+                try:
+                    yield elem
+                finally:
+                    _calls.current = None
+        except Exception as e:
+            record.error = e
+            raise
+        finally:
+            elements.close()
+            record.response_bytes = r.raw.tell() if hasattr(r.raw, 'tell') else 0
+            _emit(record)
+
+    def close(self):
+        """Close the client's connections"""
+
+        self.close_pool()
+        self._transport.close()
+
+
+def _bound(method):
+    """Decorate a method that makes requests, so that it uses the client
+    its object (a model object or QuerySet) belongs to, if any"""
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        client = self.__dict__.get('_client')
+        if client is None:
+            return method(self, *args, **kwargs)
+        with client:
+            return method(self, *args, **kwargs)
+
+    return wrapper
+
+
+class _BoundModel(object):
+    """A model bound to a client by Model.using(client). Its methods and
+    constructor run with the client active."""
+
+    def __init__(self, model, client):
+        self._model = model
+        self._client = client
+
+    def __repr__(self):
+        return '<{} using {!r}>'.format(self._model.__name__, self._client)
+
+    def __call__(self, *args, **kwargs):
+        with self._client:
+            return self._model(*args, **kwargs)
+
+    def __getattr__(self, name):
+        value = getattr(self._model, name)
+        if not callable(value):
+            return value
+
+        @functools.wraps(value)
+        def call(*args, **kwargs):
+            with self._client:
+                return value(*args, **kwargs)
+
+        return call
+
+
+class _HighriseType(type):
+    """Metaclass for Highrise, keeping the connection settings that used
+    to be class attributes readable there"""
+
+    @property
+    def token(cls):
+        return cls.client().token
+
+    @property
+    def _server(cls):
+        return cls.client()._server
+
+
+@add_metaclass(_HighriseType)
 class Highrise:
-    """Class designed to handle all interactions with the Highrise API."""
+    """Class designed to handle all interactions with the Highrise API.
+
+    The connection settings and requests apply to the current Client:
+    the one active in this thread (see Client), or the default client."""
 
-    _server = None
     _tzoffset = 0
+    _tzdelta = timedelta(0)
+    _sinks = []
+    _default_client = Client()
+
+    @classmethod
+    def client(cls):
+        """Return the Client that requests are made with in this thread"""
+
+        return Client.current() or cls._default_client
 
     @classmethod
     def auth(cls, token):
         """Define the settings used to connect to Highrise"""
 
-        cls.token = token
+        cls.client().auth(token)
 
     @classmethod
     def set_server(cls, server):
         """Define the server to be used for API requests"""
 
-        if server[:4] == 'http':
-            cls._server = server.strip('/')
-        else:
-            cls._server = "https://{}.highrisehq.com".format(server)
+        cls.client().set_server(server)
+
+    @classmethod
+    def configure_pool(cls, pool_size=10, max_per_host=10, keep_alive=True, block=False):
+        """Configure the HTTP connection pool. See Client.configure_pool."""
+
+        cls.client().configure_pool(pool_size, max_per_host, keep_alive, block)
+
+    @classmethod
+    def close_pool(cls):
+        """Close all pooled connections"""
+
+        cls.client().close_pool()
+
+    @classmethod
+    def session(cls):
+        """Return the pooled requests session, creating it if needed"""
+
+        return cls.client().session()
+
+    @classmethod
+    def set_transport(cls, transport):
+        """Send every request through a Transport, e.g. a FakeHighrise
+        from pyrise_fake, or pass None to go back to the requests library"""
+
+        cls.client().set_transport(transport)
+
+    @classmethod
+    def pool_stats(cls):
+        """Return hit/miss counts for the connection pool. See Client.pool_stats."""
+
+        return cls.client().pool_stats()
+
+    @classmethod
+    def set_scheduler(cls, scheduler):
+        """Send every request through a RequestScheduler, or pass None to
+        stop scheduling requests"""
+
+        cls.client().set_scheduler(scheduler)
+
+    @classmethod
+    def set_validator_cache(cls, cache):
+        """Revalidate GET requests against a ValidatorCache, or pass None
+        to stop caching"""
+
+        cls.client().set_validator_cache(cache)
+
+    @classmethod
+    def set_reference_cache(cls, cache):
+        """Cache users, tags and custom fields in a ReferenceCache (or
+        anything with the same interface), or pass None to stop caching"""
+
+        cls.client().set_reference_cache(cache)
+
+    @classmethod
+    def add_sink(cls, sink):
+        """Call sink(record) with a CallRecord for every request, e.g. a
+        MetricsRegistry, a SlowCallLog or any function"""
+
+        cls._sinks = cls._sinks + [sink]
+
+    @classmethod
+    def remove_sink(cls, sink):
+        """Stop sending CallRecords to a sink"""
+
+        cls._sinks = [s for s in cls._sinks if s is not sink]
+
+    @classmethod
+    def set_mirror(cls, mirror):
+        """Answer filter() queries from a SQLiteMirror while it is fresh,
+        or pass None to always ask Highrise"""
+
+        cls.client().set_mirror(mirror)
+
+    @classmethod
+    def _mirrored(cls, model, **kwargs):
+        """Return the current client's mirror's answer to a filter() query,
+        or None"""
+
+        return cls.client()._mirrored(model, **kwargs)
 
     @classmethod
     def set_timezone_offset(cls, offset):
@@ -45,18 +1378,33 @@ class Highrise:
         server timezone, if desired"""
 
         cls._tzoffset = offset
+        cls._tzdelta = timedelta(hours=offset)
+
+    @classmethod
+    def set_datetime_mode(cls, mode):
+        """Choose how datetime values from Highrise are decoded.
+
+        'datetime' (the default) decodes them to datetime objects as they
+        are parsed. 'lazy' keeps the raw string until the attribute is
+        first accessed. 'raw' keeps them as strings in Highrise's format
+        (e.g. 2012-03-10T15:11:52Z) and 'epoch' as integer UTC timestamps;
+        neither of these apply the timezone offset."""
+
+        if mode not in _datetime_converters:
+            raise ValueError('datetime mode must be one of: {}'.format(', '.join(sorted(_datetime_converters))))
+        _converters['datetime'] = _datetime_converters[mode]
 
     @classmethod
     def from_utc(cls, date):
         """Convert a date from UTC using the _tzoffset value"""
 
-        return date + timedelta(hours=cls._tzoffset)
+        return date + cls._tzdelta
 
     @classmethod
     def to_utc(cls, date):
         """Convert a date to UTC using the _tzoffset value"""
 
-        return date - timedelta(hours=cls._tzoffset)
+        return date - cls._tzdelta
 
     @classmethod
     def parseurl(cls, val):
@@ -72,26 +1420,18 @@ class Highrise:
         Ordinarily, you shouldn't have to call this method directly,
         but it's available to send arbitrary requests if needed."""
 
-        # build the base request URL
-        url = '{}/{}'.format(cls._server, path.strip('/'))
+        return cls.client().request(path, method, xml, hooks, **request_kwargs)
 
-        # make the request
-        kwargs = {'auth': (cls.token, 'X')}
-        kwargs.update(request_kwargs)
+    @classmethod
+    def arequest(cls, path, method='GET', xml=None, hooks=None, **request_kwargs):
+        """Coroutine version of request()"""
+
+        return cls.client().arequest(path, method=method, xml=xml, hooks=hooks, **request_kwargs)
+
+    @classmethod
+    def _raise_for_status(cls, r):
+        """Raise the appropriate exception for an error response"""
 
-        if xml:
-            kwargs['data'] = xml
-            kwargs['headers'] = {'Content-Type': 'application/xml'}
-        if method == 'GET':
-            r = requests.get(url, **kwargs)
-        elif method == 'POST':
-            r = requests.post(url, **kwargs)
-        elif method == 'PUT':
-            r = requests.put(url, **kwargs)
-        elif method == 'DELETE':
-            r = requests.delete(url, **kwargs)
-
-        # raise appropriate exceptions if there is an error
         if r.status_code >= 400:
             if r.status_code == 400:
                 raise BadRequest
@@ -105,23 +1445,19 @@ class Highrise:
                 raise GatewayFailure(r.text)
             elif r.status_code == 502:
                 raise GatewayConnectionError(r.text)
+            elif r.status_code == 503:
+                raise ServiceUnavailable(r.text, retry_after=_retry_after(r.headers.get('Retry-After')))
             elif r.status_code == 507:
                 raise InsufficientStorage(r.text)
             else:
                 raise UnexpectedResponse(r.text)
 
-        if hooks and 'response' in hooks:
-            hooks['response'](r)
-
-        # if this was a PUT or DELETE request, return status (hopefully success)
-        if method in ('PUT', 'DELETE'):
-            return r.status_code
+    @classmethod
+    def iterparse(cls, path, tag, hooks=None, **request_kwargs):
+        """Stream a GET request to Highrise, parsing the response
+        incrementally as it arrives. See Client.iterparse."""
 
-        # for GET and POST requests, return the XML response
-        try:
-            return ElementTree.fromstring(r.text)
-        except Exception:
-            raise UnexpectedResponse("The server sent back something that wasn't valid XML.")
+        return cls.client().iterparse(path, tag, hooks, **request_kwargs)
 
     @classmethod
     def key_to_class(cls, key):
@@ -150,9 +1486,404 @@ class Highrise:
         return key[1:]
 
 
+def _datetime_fields(text):
+    """Split a Highrise datetime string (e.g. 2012-03-10T15:11:52Z) into
+    its integer parts, without the overhead of strptime"""
+
+    if len(text) == 20 and text[4] == '-' and text[10] == 'T' and text[19] == 'Z':
+        try:
+            return (int(text[0:4]), int(text[5:7]), int(text[8:10]),
+                    int(text[11:13]), int(text[14:16]), int(text[17:19]))
+        except ValueError:
+            pass
+
+    # anything that isn't in the usual format goes the slow way
+    return datetime.strptime(text, '%Y-%m-%dT%H:%M:%SZ').timetuple()[:6]
+
+
+def _parse_datetime(text):
+    """Convert a Highrise datetime string to a datetime in local time"""
+
+    value = datetime(*_datetime_fields(text))
+    if Highrise._tzoffset:
+        value += Highrise._tzdelta
+    return value
+
+
+def _parse_epoch(text):
+    """Convert a Highrise datetime string to an integer UTC timestamp"""
+
+    return calendar.timegm(_datetime_fields(text))
+
+
+def _defer(text):
+    """Placeholder converter for values that are decoded on first access"""
+
+    return text
+
+
+# functions to convert element text to Python values, by the element's type attribute
+_converters = {
+    'integer': int,
+    'datetime': _parse_datetime,
+}
+
+# datetime converters for each of the modes Highrise.set_datetime_mode accepts
+_datetime_converters = {
+    'datetime': _parse_datetime,
+    'lazy': _defer,
+    'raw': text_type,
+    'epoch': _parse_epoch,
+}
+
+# kinds of parse plan entries
+_SCALAR = 0
+_OBJECT = 1
+_LIST = 2
+_CONTACT_DATA = 3
+
+# Highrise XML tags already resolved to the class that represents them
+_tag_classes = {}
+
+
+def _class_for_element(element):
+    """Return the class used to represent a nested XML element"""
+
+    tag = element.tag
+    if tag == 'party':
+        return getattr(sys.modules[__name__], element.find('type').text)
+
+    try:
+        return _tag_classes[tag]
+    except KeyError:
+        klass = getattr(sys.modules[__name__], Highrise.key_to_class(tag.replace('_', '-')))
+        _tag_classes[tag] = klass
+        return klass
+
+
+def _compact_value(value):
+    """Convert a field value for storage on a compact record"""
+
+    if isinstance(value, HighriseObject):
+        return value.compact()
+    if isinstance(value, list):
+        return tuple(_compact_value(item) for item in value)
+    return value
+
+
+def _expand_value(value):
+    """Convert a compact record's field value back to a full object value"""
+
+    if isinstance(value, CompactRecord):
+        return value.to_object()
+    if isinstance(value, tuple):
+        return [_expand_value(item) for item in value]
+    return value
+
+
+def _record_xml(obj):
+    """Return XML for every field of an object, read-only ones included,
+    in the form Highrise sends it so that from_xml can read it back"""
+
+    if isinstance(obj, Party):
+        xml = ElementTree.Element('party')
+        ElementTree.SubElement(xml, 'type').text = type(obj).__name__
+    else:
+        xml = ElementTree.Element(Highrise.class_to_key(type(obj).__name__))
+    # from_xml takes an element without text for an empty value
+    xml.text = '\n'
+
+    values = obj.__dict__
+    deferred = values.get('_deferred') or {}
+    for field, settings in obj.fields.items():
+        tag = field.replace('_', '-')
+        if field in deferred:
+            ElementTree.SubElement(xml, tag, type='datetime').text = deferred[field]
+            continue
+
+        # leave out the values a new object starts with anyway
+        value = values.get(field)
+        if value is None or value == [] or (value == settings.default_value and settings.default_factory is None):
+            continue
+        if isinstance(value, HighriseObject):
+            element = _record_xml(value)
+            element.tag = tag
+            xml.append(element)
+            continue
+
+        element = ElementTree.SubElement(xml, tag)
+        if isinstance(value, list):
+            element.text = '\n'
+            element.extend(_record_xml(item) for item in value)
+        elif isinstance(value, datetime):
+            element.set('type', 'datetime')
+            element.text = datetime.strftime(Highrise.to_utc(value), '%Y-%m-%dT%H:%M:%SZ')
+        elif settings.type == datetime and isinstance(value, int):
+            element.set('type', 'datetime')
+            element.text = datetime.strftime(datetime.utcfromtimestamp(value), '%Y-%m-%dT%H:%M:%SZ')
+        elif isinstance(value, bool):
+            element.text = 'true' if value else 'false'
+        elif isinstance(value, integer_types):
+            element.set('type', 'integer')
+            element.text = text_type(value)
+        else:
+            element.text = text_type(value)
+    return xml
+
+
+class CompactRecord(object):
+    """A compact, __slots__-based copy of a Highrise object.
+
+    Every model has a record class (e.g. Person.compact_class) with a slot
+    for each of its fields. Nested objects are stored as records too, and
+    lists as tuples."""
+
+    __slots__ = ()
+    model = None
+
+    def __repr__(self):
+        return '<{} {}>'.format(type(self).__name__, getattr(self, 'id', None))
+
+    def to_object(self):
+        """Return a full object with the same values as this record"""
+
+        obj = self.model.__new__(self.model)
+        for field in self.__slots__:
+            obj.__dict__[field] = _expand_value(getattr(self, field, None))
+        return obj
+
+
+class _IdentityState(threading.local):
+    """The stack of identity maps active in each thread"""
+
+    def __init__(self):
+        self.stack = []
+
+
+_identity = _IdentityState()
+
+
+class IdentityMap(object):
+    """An identity map that makes sure there is only ever one object for
+    each Highrise record while it is active.
+
+    Use it as a context manager. Inside the block, every object parsed
+    from Highrise (by get, filter, all and so on, including nested
+    parties in deals and cases) is looked up by (class, id). If an
+    object for that record already exists, the new data is merged into
+    it and the existing object is returned.
+
+    By default objects are held with weak references, so they are
+    forgotten once nothing else uses them. Pass max_size to hold up to
+    that many objects strongly instead, evicting the least recently used."""
+
+    def __init__(self, max_size=None):
+        self.max_size = max_size
+        if max_size is None:
+            self._objects = weakref.WeakValueDictionary()
+        else:
+            self._objects = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        _identity.stack.append(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        _identity.stack.pop()
+
+    def __len__(self):
+        return len(self._objects)
+
+    @classmethod
+    def current(cls):
+        """Return the identity map active in this thread, or None"""
+
+        stack = _identity.stack
+        return stack[-1] if stack else None
+
+    def get(self, model, id):
+        """Return the object for a record if it is in the map, or None"""
+
+        with self._lock:
+            return self._objects.get((model, id))
+
+    def add(self, obj, keys=None):
+        """Add an object to the map and return the object that represents
+        its record. If the record is already mapped, the values of obj's
+        fields in keys (or all of them) are merged into the mapped object,
+        except for fields that were set on it and not saved yet."""
+
+        key = (type(obj), obj.__dict__.get('id'))
+        with self._lock:
+            existing = self._objects.get(key)
+            if existing is None or existing is obj:
+                self._objects[key] = obj
+                existing = obj
+            else:
+                keys = obj.fields if keys is None else keys
+                dirty = existing.__dict__.get('_dirty')
+                if dirty:
+                    keys = [name for name in keys if name not in dirty]
+                _merge_values(existing, obj, keys)
+
+            if self.max_size is not None:
+                self._objects.pop(key)
+                self._objects[key] = existing
+                while len(self._objects) > self.max_size:
+                    self._objects.popitem(last=False)
+
+        return existing
+
+    def _put(self, obj):
+        """Make obj the object for its record, in place of any other"""
+
+        key = (type(obj), obj.__dict__.get('id'))
+        with self._lock:
+            self._objects.pop(key, None)
+            self._objects[key] = obj
+            if self.max_size is not None:
+                while len(self._objects) > self.max_size:
+                    self._objects.popitem(last=False)
+
+    def clear(self):
+        """Forget every object"""
+
+        with self._lock:
+            self._objects.clear()
+
+
+def _changed(value, loaded):
+    """Return True if a list or child object field is different from
+    when it was loaded. Lists are compared with the tuple of objects
+    they held then, and each child object is asked in turn."""
+
+    if isinstance(value, list):
+        if not isinstance(loaded, tuple) or len(value) != len(loaded):
+            return True
+        return any(item is not old or _object_changed(item) for item, old in zip(value, loaded))
+    return _object_changed(value)
+
+
+def _object_changed(value):
+    """Return True if value is an object that was changed (or created)
+    since it was loaded"""
+
+    return isinstance(value, HighriseObject) and value.changed_fields() != []
+
+
+def _prune(value, loaded):
+    """Return a copy of a changed field value without the child objects
+    that haven't changed since loading, since Highrise leaves the ones
+    that aren't sent alone"""
+
+    if isinstance(value, list) and isinstance(loaded, tuple):
+        unchanged = set(id(item) for item in loaded)
+        return [item for item in value if id(item) not in unchanged or _object_changed(item)]
+
+    if isinstance(value, HighriseObject):
+        changed = value.changed_fields()
+        if changed is not None:
+            pruned = type(value)()
+            for key in changed:
+                pruned.__dict__[key] = _prune(value.__dict__[key], value.__dict__['_loaded'].get(key))
+            return pruned
+
+    return value
+
+
+# the _loaded value for objects without list fields, which is never changed
+_NOTHING_LOADED = {}
+
+
+def _merge_values(target, source, keys):
+    """Copy the values of keys from source to target, keeping track of
+    values that are still deferred by the 'lazy' datetime mode"""
+
+    values = target.__dict__
+    new_values = source.__dict__
+    deferred = new_values.get('_deferred') or {}
+    for key in keys:
+        if key in deferred:
+            values.pop(key, None)
+            values.setdefault('_deferred', {})[key] = deferred[key]
+        elif key in new_values:
+            values[key] = new_values[key]
+            if values.get('_deferred'):
+                values['_deferred'].pop(key, None)
+
+    # the merged values are now the ones Highrise has
+    if values.get('_dirty'):
+        values['_dirty'].difference_update(keys)
+    loaded = dict(values.get('_loaded') or {})
+    loaded.update((key, value) for key, value in new_values['_loaded'].items() if key in keys)
+    values['_loaded'] = loaded
+
+
+class HighriseObjectType(type):
+    """Metaclass for Highrise objects.
+
+    Gives every class its own parse plan, a table mapping XML tags to
+    (attribute, field, kind) entries so from_xml can handle each element
+    with a single lookup. It is seeded from the class's fields when the
+    class is defined and also remembers tags it has seen since, including
+    the ones it ignores.
+
+    The field defaults, the editable field names and the __slots__ class
+    used by compact() are worked out here too, once per class."""
+
+    def __init__(cls, name, bases, attrs):
+        super(HighriseObjectType, cls).__init__(name, bases, attrs)
+        cls._plan = {}
+        for key in cls.fields:
+            cls._plan_entry(key)
+            cls._plan_entry(key.replace('_', '-'))
+
+        # split the field defaults into ones that can be shared by every
+        # object and ones that need a fresh value each time
+        cls._default_values = {}
+        cls._default_factories = []
+        for key, field in cls.fields.items():
+            if field.default_factory is None:
+                cls._default_values[key] = field.default_value
+            else:
+                cls._default_factories.append((key, field.default_factory))
+        cls._editable = tuple(key for key, field in cls.fields.items() if field.is_editable)
+        cls._list_fields = tuple(key for key, field in cls.fields.items() if field.type == list)
+        cls._object_fields = tuple(key for key, field in cls.fields.items() if isinstance(field.type, HighriseObjectType))
+
+        cls.compact_class = type(str(name + 'Record'), (CompactRecord,), {
+            '__slots__': tuple(cls.fields),
+            'model': cls,
+        })
+
+    def _plan_entry(cls, tag):
+        """Compile and remember the parse plan entry for an XML tag"""
+
+        key = tag.replace('-', '_')
+        field = cls.fields.get(key)
+        if field is None:
+            entry = None
+        elif key == 'contact_data':
+            entry = (key, field, _CONTACT_DATA)
+        elif field.type == list:
+            entry = (key, field, _LIST)
+        else:
+            entry = (key, field, _OBJECT)
+
+        cls._plan[tag] = entry
+        return entry
+
+
+@add_metaclass(HighriseObjectType)
 class HighriseObject(object):
     """Base class for all Highrise data objects"""
 
+    fields = {}
+
+    # how to load each related collection (like a party's notes), by name
+    _relations = {}
+
     @classmethod
     def from_xml(cls, xml, parent=None):
         """Create a new object from XML data"""
@@ -161,68 +1892,85 @@ class HighriseObject(object):
         if cls == Party:
             cls = getattr(sys.modules[__name__], xml.get('type'))
         self = cls()
+        values = self.__dict__
+        plan = cls._plan
 
         for child in xml:
-            # convert the key to underscore notation for Python
-            key = child.tag.replace('-', '_')
+            # look up how to handle this element, compiling it on first sight
+            try:
+                entry = plan[child.tag]
+            except KeyError:
+                entry = cls._plan_entry(child.tag)
 
             # if this key is not recognized by pyrise, ignore it
-            if key not in cls.fields:
+            if entry is None:
                 continue
+            key, field, kind = entry
 
             # if there is no data, just set the default
-            if child.text is None:
-                self.__dict__[key] = self.fields[key].default
+            text = child.text
+            if text is None:
+                values[key] = field.default
                 continue
 
             # handle the contact-data key differently
-            if key == 'contact_data':
-                klass = getattr(sys.modules[__name__], 'ContactData')
-                self.contact_data = klass.from_xml(child, parent=self)
+            if kind == _CONTACT_DATA:
+                values[key] = ContactData.from_xml(child, parent=self)
                 continue
 
             # if this an element with children, it's an object relationship
-            if len(list(child)) > 0:
+            if len(child):
                 # is this element an array of objects?
-                if cls.fields[key].type == list:
-                    items = []
-                    for item in child:
-                        if item.tag == 'party':
-                            class_string = item.find('type').text
-                        else:
-                            class_string = Highrise.key_to_class(item.tag.replace('_', '-'))
-                        klass = getattr(sys.modules[__name__], class_string)
-                        items.append(klass.from_xml(item, parent=self))
-                    self.__dict__[child.tag.replace('-', '_')] = items
-                    continue
+                if kind == _LIST:
+                    values[key] = [_class_for_element(item).from_xml(item, parent=self) for item in child]
 
                 # otherwise, let's treat it like a single object
                 else:
-                    if child.tag == 'party':
-                        class_string = child.find('type').text
-                    else:
-                        class_string = Highrise.key_to_class(child.tag)
-                    klass = getattr(sys.modules[__name__], class_string)
-                    self.__dict__[child.tag.replace('-', '_')] = klass.from_xml(child, parent=self)
-                    continue
+                    values[key] = _class_for_element(child).from_xml(child, parent=self)
+                continue
 
             # get and convert attribute value based on type
-            data_type = child.get('type')
-            if data_type == 'integer':
-                value = int(child.text)
-            elif data_type == 'datetime':
-                value = Highrise.from_utc(datetime.strptime(child.text, '%Y-%m-%dT%H:%M:%SZ'))
+            converter = _converters.get(child.get('type'), text_type)
+            if converter is _defer:
+                values.pop(key, None)
+                values.setdefault('_deferred', {})[key] = text
             else:
-                value = text_type(child.text)
+                values[key] = converter(text)
+
+        # remember the lists that were loaded, so save() can tell what changed
+        if cls._list_fields:
+            loaded = values['_loaded'] = {}
+            for key in cls._list_fields:
+                value = values.get(key)
+                if value.__class__ is list:
+                    loaded[key] = tuple(value)
+        else:
+            values['_loaded'] = _NOTHING_LOADED
 
-            # add value to object dictionary
-            self.__dict__[key] = value
+        # child objects Highrise sent empty, or not at all, are defaults
+        # that count as loaded, rather than new objects to send back
+        for key in cls._object_fields:
+            value = values.get(key)
+            if value is not None and '_loaded' not in value.__dict__:
+                value._snapshot()
+
+        # if an identity map is active, return the one object for this record
+        if _identity.stack and values.get('id') is not None:
+            keys = [entry[0] for entry in (plan.get(child.tag) for child in xml) if entry is not None]
+            return _identity.stack[-1].add(self, keys)
 
         return self
 
     @classmethod
-    def _list(cls, path, tag):
-        """Get a list of objects of this type from Highrise"""
+    @_instrumented
+    def _list(cls, path, tag, stream=False):
+        """Get a list of objects of this type from Highrise.
+
+        If stream is True, return a generator that parses the response
+        incrementally and yields each object as soon as it is complete."""
+
+        if stream:
+            return cls._stream(Highrise.iterparse(path, tag), Client.current())
 
         # retrieve the data from Highrise
         objects = []
@@ -232,23 +1980,420 @@ class HighriseObject(object):
         for item in xml.iter(tag):
             objects.append(cls.from_xml(item))
 
-        return objects
+        return objects
+
+    @classmethod
+    def _stream(cls, elements, client):
+        """Yield objects as their elements are parsed, for _list(stream=True),
+        belonging to client if it isn't None"""
+
+        for item in elements:
+            record = _calls.current
+            if record is not None:
+                start = _clock()
+
+            if client is None:
+                obj = cls.from_xml(item)
+            else:
+                with client:
+                    obj = cls.from_xml(item)
+
+            if record is not None:
+                record.construct_time += _clock() - start
+            yield obj
+
+    @classmethod
+    def _cached(cls, key, fetch):
+        """Return the result of fetch(), going through the reference
+        cache if one is set. List results are copied on the way out so
+        callers can't change what is cached."""
+
+        client = Highrise.client()
+        cache = client._reference_cache
+        if cache is None:
+            return fetch()
+
+        cache_key = (client.token, cls.__name__, key)
+        value = cache.get(cache_key)
+        if value is None:
+            value = fetch()
+            if value is not None:
+                cache.set(cache_key, value)
+        return list(value) if isinstance(value, list) else value
+
+    @classmethod
+    def invalidate_cached(cls, key):
+        """Forget a cached reference lookup, e.g. Tag.invalidate_cached('all')
+        or User.invalidate_cached(user_id)"""
+
+        client = Highrise.client()
+        cache = client._reference_cache
+        if cache is not None:
+            cache.delete((client.token, cls.__name__, key))
+
+    @classmethod
+    def using(cls, client):
+        """Return this model bound to a Client, so that e.g.
+        Person.using(client).get(5) makes its requests through client"""
+
+        return _BoundModel(cls, client)
+
+    @classmethod
+    def get_many(cls, ids, concurrency=8):
+        """Get many objects by id at once, using up to concurrency
+        requests in parallel.
+
+        Returns a BatchResult with the objects in the same order as ids.
+        If an id couldn't be fetched (e.g. it raised NotFound), its place
+        in the list is None and the exception is in result.errors[id]."""
+
+        ids = list(ids)
+        result = BatchResult()
+        for id, (obj, error) in zip(ids, _map_concurrent(cls.get, ids, concurrency)):
+            result.append(obj)
+            if error is not None:
+                result.errors[id] = error
+
+        return result
+
+    @classmethod
+    def prefetch(cls, objects, *relations, **kwargs):
+        """Load related collections (e.g. 'notes' or 'tasks') for every
+        one of objects at once, using up to concurrency requests in
+        parallel, so that using them afterwards makes no requests.
+
+        Returns a dict of the exceptions raised for any (object id,
+        relation) pairs that couldn't be loaded. Those are requested
+        again if they are used, like they would be without prefetch."""
+
+        concurrency = kwargs.pop('concurrency', 8)
+        jobs = []
+        for obj in objects:
+            for name in relations:
+                if name not in obj._relations:
+                    raise KeyError('{} has no related {} to prefetch'.format(type(obj).__name__, name))
+                if obj.id is not None:
+                    jobs.append((obj, name))
+
+        def load(job):
+            obj, name = job
+            return _bound(obj._relations[name])(obj)
+
+        errors = {}
+        for (obj, name), (value, error) in zip(jobs, _map_concurrent(load, jobs, concurrency)):
+            if error is not None:
+                errors[(obj.id, name)] = error
+            else:
+                obj.__dict__.setdefault('_related', {})[name] = value
+        return errors
+
+    @_bound
+    def _relation(self, name):
+        """Return a related collection, loading it the first time it is
+        used (unless it was prefetched) and remembering it after that"""
+
+        related = self.__dict__.setdefault('_related', {})
+        if name not in related:
+            related[name] = self._relations[name](self)
+        return related[name]
+
+    def refresh_related(self, *names):
+        """Forget the related collections that have been loaded (or just
+        the ones named), so they are requested again the next time they
+        are used"""
+
+        related = self.__dict__.get('_related')
+        if not related:
+            return
+        if not names:
+            related.clear()
+        for name in names:
+            related.pop(name, None)
+
+    def _related_loaded(self, name):
+        """Return a related collection if it has been loaded, or None"""
+
+        return (self.__dict__.get('_related') or {}).get(name)
+
+    @classmethod
+    def refresh_many(cls, objects, concurrency=8):
+        """Reload many objects of this class from Highrise at once, e.g.
+        the ones saved with refetch='defer'. Returns a dict of the
+        exceptions raised for any ids that couldn't be fetched."""
+
+        objects = list(objects)
+        for obj in objects:
+            obj.__dict__.pop('_dirty', None)
+        fresh = cls.get_many([obj.id for obj in objects], concurrency=concurrency)
+        for obj, new in zip(objects, fresh):
+            if new is not None and new is not obj:
+                obj.__dict__ = new.__dict__
+        return fresh.errors
+
+    @classmethod
+    def bulk_save(cls, objects, concurrency=8, checkpoint=None, key=None, **kwargs):
+        """Save many objects using up to concurrency requests in parallel.
+
+        This is a generator yielding an (index, obj, error) tuple for each
+        object as soon as it has been saved, where index is its position
+        in objects and error is the exception its save raised, or None.
+        A failed save (e.g. a GatewayFailure for an invalid record)
+        doesn't stop the others. objects can be any iterable, and is
+        read as saves finish rather than all at once.
+
+        Saves go through the client that is active when bulk_save is
+        called, and its RequestScheduler to stay within the rate limit.
+        If it has none, a scheduler with the default limits throttles
+        just these saves.
+
+        If checkpoint is a Checkpoint, objects it already holds the key
+        of are skipped and the key of every object saved is added to it,
+        so an interrupted import can be run again to finish it. It can
+        also be the path of a checkpoint file, which is then opened for
+        the saves and closed when they are done. key(obj) gives the key,
+        and defaults to the object's index. Any other keyword arguments
+        are passed to save()."""
+
+        def pending(done):
+            for index, obj in enumerate(objects):
+                obj_key = index if key is None else key(obj)
+                if done is None or obj_key not in done:
+                    yield index, obj, obj_key
+
+        client = Highrise.client()
+        scheduler = RequestScheduler() if client._scheduler is None else None
+
+        def save(item):
+            previous = _schedulers.current
+            _schedulers.current = scheduler
+            try:
+                with client:
+                    item[1].save(**kwargs)
+            finally:
+                _schedulers.current = previous
+
+        def results():
+            # a checkpoint opened from a path is closed once the saves stop
+            opened = Checkpoint(checkpoint) if isinstance(checkpoint, string_types) else None
+            done = checkpoint if opened is None else opened
+            try:
+                for (index, obj, obj_key), result, error in _imap_concurrent(save, pending(done), concurrency):
+                    if error is None and done is not None:
+                        done.add(obj_key)
+                    yield index, obj, error
+            finally:
+                if opened is not None:
+                    opened.close()
+
+        return results()
+
+    @_bound
+    def refresh(self):
+        """Reload the object from Highrise, discarding unsaved changes"""
+
+        self.__dict__.pop('_dirty', None)
+        new = type(self).get(self.id)
+        if new is not self:
+            self.__dict__ = new.__dict__
+
+    @property
+    def stale(self):
+        """True if the object was updated without being reloaded, so
+        values Highrise maintains (like updated_at) may be out of date"""
+
+        return self.__dict__.get('_stale', False)
+
+    @_bound
+    @_instrumented
+    def _save(self, refetch='auto', **kwargs):
+        """Save the object to Highrise with a POST or PUT.
+
+        A POST returns the new record, which always replaces the values
+        of the object. An update only sends the fields that changed
+        since the object was loaded, and is skipped altogether if there
+        are none. Highrise returns nothing for it, so what happens next
+        depends on refetch: True requests the object again, False and
+        'defer' keep the values that were sent (marking the object as
+        stale, to be reloaded later with refresh() or refresh_many()),
+        and 'auto' only requests it again when new child objects (like
+        a new phone number) need the ids Highrise gave them. Those are
+        requested whatever refetch is, since without their ids the next
+        save would create them again."""
+
+        xml_string = self._save_body()
+
+        # if this was an initial save, update the object with the returned data
+        if self.id is None:
+            response = Highrise.request('/{}.xml'.format(self.plural), method='POST', xml=xml_string, **kwargs)
+            self._created(response)
+            return
+
+        if xml_string is None:
+            return
+        Highrise.request('/{}/{}.xml'.format(self.plural, self.id), method='PUT', xml=xml_string, **kwargs)
+        if self._saved(refetch):
+            self.refresh()
+
+    def _created(self, xml):
+        """Take the values of the record Highrise created for this object,
+        which is now the one an active identity map has for it"""
+
+        self.__dict__ = self.from_xml(xml).__dict__
+        if _identity.stack:
+            _identity.stack[-1]._put(self)
+
+    def _save_body(self):
+        """Return the XML to send for save(), or None if nothing changed"""
+
+        changed = self.changed_fields() if self.id is not None else None
+        if changed is None:
+            xml = self.save_xml()
+        elif changed:
+            xml = self.save_xml(only=changed)
+        else:
+            return None
+        return _xml_bytes(xml)
+
+    def _saved(self, refetch):
+        """Update the object's state after a PUT, and return True if it
+        should be requested again"""
+
+        # new child objects are sent again until they have their ids
+        if refetch is True or self._has_new_children():
+            return True
+        self.__dict__['_stale'] = True
+        self._snapshot()
+        return False
+
+    def _snapshot(self):
+        """Mark the object and its child objects as unchanged, after
+        their values were sent to Highrise"""
+
+        values = self.__dict__
+        values.pop('_dirty', None)
+        values['_loaded'] = dict((key, tuple(values[key])) for key in self._list_fields
+                                 if isinstance(values.get(key), list))
+        for key in self._editable:
+            value = values.get(key)
+            for item in value if isinstance(value, list) else (value,):
+                if isinstance(item, HighriseObject):
+                    item._snapshot()
+
+    def changed_fields(self):
+        """Return the names of the editable fields that were modified since
+        the object was loaded from Highrise, or None if it wasn't loaded
+        (so everything about it is new)"""
+
+        values = self.__dict__
+        loaded = values.get('_loaded')
+        if loaded is None or ('id' in self.fields and values.get('id') is None):
+            return None
+
+        dirty = values.get('_dirty', ())
+        changed = []
+        for key in self._editable:
+            if key in dirty:
+                changed.append(key)
+            elif key in loaded or key in self._list_fields:
+                if _changed(values.get(key), loaded.get(key)):
+                    changed.append(key)
+            elif _object_changed(values.get(key)):
+                changed.append(key)
+        return changed
+
+    def __setattr__(self, name, value):
+        """Set an attribute, remembering which fields have been changed"""
+
+        object.__setattr__(self, name, value)
+        if name in self.fields:
+            self.__dict__.setdefault('_dirty', set()).add(name)
+
+    def _has_new_children(self):
+        """Return True if any editable child object hasn't been given an
+        id by Highrise yet"""
+
+        for field, settings in self.fields.items():
+            if not settings.is_editable:
+                continue
+            value = self.__dict__.get(field)
+            for item in value if isinstance(value, list) else (value,):
+                if not isinstance(item, HighriseObject):
+                    continue
+                if 'id' in item.fields and item.__dict__.get('id') is None:
+                    return True
+                if item._has_new_children():
+                    return True
+        return False
 
     def __init__(self, parent=None, **kwargs):
         """Create a new object manually."""
 
-        self._server = Highrise._server
-        for field, settings in self.fields.items():
-            if field in kwargs:
-                if not settings.is_editable:
-                    raise KeyError('{} is not an editable attribute'.format(field))
-                value = kwargs.pop(field)
-            else:
-                value = settings.default
-            self.__dict__[field] = value
+        values = self.__dict__
+        values.update(self._default_values)
+        for field, factory in self._default_factories:
+            values[field] = factory()
+
+        # belong to the client that is active, if any
+        if _clients.stack:
+            values['_client'] = _clients.stack[-1]
 
-    def save_xml(self, include_id=False, **kwargs):
-        """Return the object XML for sending back to Highrise"""
+        for field, value in kwargs.items():
+            settings = self.fields.get(field)
+            if settings is None:
+                continue
+            if not settings.is_editable:
+                raise KeyError('{} is not an editable attribute'.format(field))
+            values[field] = value
+
+    def __getstate__(self):
+        # the client an object belongs to can't be pickled
+        state = self.__dict__
+        if '_client' in state:
+            state = dict(state)
+            del state['_client']
+        return state
+
+    def __getattr__(self, name):
+        """Decode datetime values deferred by the 'lazy' datetime mode
+        the first time they are accessed"""
+
+        deferred = self.__dict__.get('_deferred')
+        if deferred and name in deferred:
+            value = self.__dict__[name] = _parse_datetime(deferred.pop(name))
+            return value
+        raise AttributeError(name)
+
+    def _resolve_deferred(self):
+        """Decode any datetime values that are still deferred"""
+
+        deferred = self.__dict__.pop('_deferred', None)
+        if deferred:
+            for key, text in deferred.items():
+                # a value assigned since loading wins over the deferred one
+                if key not in self.__dict__:
+                    self.__dict__[key] = _parse_datetime(text)
+
+    def compact(self):
+        """Return a compact, __slots__-based copy of this object.
+
+        Compact records use a fraction of the memory of full objects,
+        which makes them a good fit for holding large numbers of objects
+        at once. Use to_object() on the record to get a full object back."""
+
+        self._resolve_deferred()
+        record = self.compact_class()
+        for field in self.fields:
+            setattr(record, field, _compact_value(self.__dict__.get(field)))
+        return record
+
+    def save_xml(self, include_id=False, only=None, **kwargs):
+        """Return the object XML for sending back to Highrise.
+
+        If only is a list of field names, just those fields are included,
+        without the child objects that haven't changed since loading."""
+
+        # make sure every value is available to send
+        self._resolve_deferred()
 
         # create new XML object
         if 'base_element' not in kwargs:
@@ -259,7 +2404,7 @@ class HighriseObject(object):
 
         # if the id should be included and it is not None, add it first
         if include_id and 'id' in self.__dict__ and self.id != None:
-            id_element = ElementTree.SubElement(xml, tag='id', attrib={'type': 'integer'})
+            id_element = ElementTree.SubElement(xml, 'id', attrib={'type': 'integer'})
             id_element.text = text_type(self.id)
 
         # now iterate over the editable attributes
@@ -274,8 +2419,14 @@ class HighriseObject(object):
             if not settings.is_editable:
                 continue
 
+            # only send the changed fields, including ones set back to the default
+            if only is not None:
+                if field not in only:
+                    continue
+                value = _prune(value, self.__dict__.get('_loaded', {}).get(field))
+
             # if the value is equal to the default, don't pass it
-            if value == settings.default:
+            elif value == settings.default:
                 continue
 
             # if the value is a HighriseObject, insert the XML for it
@@ -288,7 +2439,9 @@ class HighriseObject(object):
 
             # insert the remaining single-attribute elements
             e = ElementTree.Element(field_name, **extra_attrs_copy)
-            if isinstance(value, int):
+            if settings.type == datetime and isinstance(value, int):
+                e.text = datetime.strftime(datetime.utcfromtimestamp(value), '%Y-%m-%dT%H:%M:%SZ')
+            elif isinstance(value, int):
                 e.text = text_type(value)
             elif isinstance(value, list):
                 if len(value) == 0:
@@ -309,28 +2462,269 @@ class HighriseField(object):
     """An object to represent the settings for an object attribute
     Note that a lot more detail could go into how this works."""
 
+    # types whose default value can be shared by every object
+    immutable_types = (str, text_type, int, float, bool)
+
     def __init__(self, type='uneditable', options=None, **kwargs):
         self.type = type
         self.options = options
         self.force_key = kwargs.pop('force_key', None)
         self.extra_attrs = kwargs.pop('extra_attrs', None)
 
+        # work out the default value once, rather than for every object;
+        # mutable defaults (and datetime.now) need a factory instead
+        self.is_editable = type not in ('id', 'uneditable')
+        if not self.is_editable:
+            self.default_value, self.default_factory = None, None
+        elif type == datetime:
+            self.default_value, self.default_factory = None, datetime.now
+        elif type in self.immutable_types:
+            self.default_value, self.default_factory = type(), None
+        else:
+            self.default_value, self.default_factory = None, type
+
     @property
     def default(self):
         """Return the default value for this data type (e.g. '' or [])"""
 
-        if self.type in ('id', 'uneditable'):
-            return None
-        elif self.type == datetime:
-            return datetime.now()
+        if self.default_factory is not None:
+            return self.default_factory()
+        return self.default_value
+
+
+class Checkpoint(object):
+    """The keys of the objects a bulk_save has saved, appended to a file
+    as each one finishes so an interrupted import can pick up where it
+    stopped.
+
+    The file stays open until close() is called, or use it as a context
+    manager: with Checkpoint(path) as checkpoint: ..."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._done = set()
+        if os.path.exists(path):
+            with io.open(path, encoding='utf-8') as f:
+                self._done.update(line.rstrip('\n') for line in f if line.strip())
+        self._file = io.open(path, 'a', encoding='utf-8')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __contains__(self, key):
+        return text_type(key) in self._done
+
+    def __len__(self):
+        return len(self._done)
+
+    def add(self, key):
+        key = text_type(key)
+        with self._lock:
+            self._done.add(key)
+            self._file.write(key + '\n')
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class BatchResult(list):
+    """The results of a bulk operation, in the order they were requested.
+
+    Items that failed are None in the list, and the exception raised for
+    each of them is stored in the errors dictionary."""
+
+    def __init__(self, iterable=(), errors=None):
+        super(BatchResult, self).__init__(iterable)
+        self.errors = errors if errors is not None else {}
+
+
+class QuerySet(object):
+    """A lazy, auto-paginating list of Highrise objects.
+
+    No request is made until the results are needed, and then pages are
+    fetched one at a time using Highrise's n= offset parameter, so only
+    the pages that are actually used are ever requested. Slicing maps
+    straight to offsets, e.g. Person.filter(tag_id=5)[:30] fetches a
+    single page. Requests go through the client that was active when
+    the QuerySet was created."""
+
+    # Highrise returns at most this many records per request
+    page_size = 500
+
+    def __init__(self, model, path, tag, paginate=True, offset=0, limit=None):
+        self.model = model
+        self.path = path
+        self.tag = tag
+        self.paginate = paginate
+        self.offset = offset
+        self.limit = limit
+        self._cache = []
+        self._done = limit == 0
+        self._prefetch = ()
+        self._prefetch_concurrency = 8
+        self._client = Client.current()
+
+    def __repr__(self):
+        return '<QuerySet {} {}>'.format(self.model.__name__, self.path)
+
+    def __iter__(self):
+        i = 0
+        while True:
+            while i < len(self._cache):
+                yield self._cache[i]
+                i += 1
+            if self._done:
+                return
+            self._fetch_page()
+
+    def __len__(self):
+        self._fetch_all()
+        return len(self._cache)
+
+    def __bool__(self):
+        return self.exists()
+
+    __nonzero__ = __bool__
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop = key.start or 0, key.stop
+            if key.step is not None or start < 0 or (stop is not None and stop < 0):
+                return list(self)[key]
+            if self._done or (stop is not None and stop <= len(self._cache)):
+                return self._cache[key]
+            if not self.paginate:
+                return list(self)[key]
+
+            # build a new query starting at the requested offset
+            limit = None if stop is None else max(stop - start, 0)
+            if self.limit is not None:
+                remaining = max(self.limit - start, 0)
+                limit = remaining if limit is None else min(limit, remaining)
+            return self._clone(offset=self.offset + start, limit=limit)
+
+        if key < 0:
+            return list(self)[key]
+        while len(self._cache) <= key and not self._done:
+            self._fetch_page()
+        return self._cache[key]
+
+    def prefetch(self, *relations, **kwargs):
+        """Return a copy of this QuerySet that loads the given related
+        collections (e.g. 'notes', 'tasks') for each page of objects as
+        it is fetched, using up to concurrency requests in parallel, so
+        that using them afterwards makes no requests"""
+
+        clone = self._clone(offset=self.offset, limit=self.limit)
+        clone._prefetch = self._prefetch + relations
+        clone._prefetch_concurrency = kwargs.pop('concurrency', self._prefetch_concurrency)
+        return clone
+
+    def iterator(self):
+        """Stream the objects without caching them.
+
+        Each page is parsed incrementally as it arrives and objects are
+        yielded as soon as they are complete, so memory use stays flat
+        no matter how many objects there are. With prefetch(), objects
+        are held back until their page is complete instead."""
+
+        n = self.offset
+        count = 0
+        while True:
+            page_count = 0
+            for obj in self._stream_page(n):
+                if self.limit is not None and count >= self.limit:
+                    return
+                yield obj
+                page_count += 1
+                count += 1
+
+            if not self.paginate or page_count < self.page_size:
+                return
+            n += page_count
+
+    def first(self):
+        """Return the first object, or None, fetching at most one page"""
+
+        for obj in self:
+            return obj
+        return None
+
+    def exists(self):
+        """Return True if there is at least one object, fetching at most one page"""
+
+        return self.first() is not None
+
+    @_bound
+    def _stream_page(self, n):
+        """Stream the objects of the page starting at offset n"""
+
+        objects = self._stream(n)
+        if not self._prefetch:
+            return objects
+
+        objects = list(objects)
+        self.model.prefetch(objects, *self._prefetch, concurrency=self._prefetch_concurrency)
+        return objects
+
+    def _page(self, n):
+        """Return the objects of the page starting at offset n"""
+
+        return self.model._list(self._page_path(n), self.tag)
+
+    def _stream(self, n):
+        """Return an iterator that parses the page starting at offset n"""
+
+        return self.model._list(self._page_path(n), self.tag, stream=True)
+
+    def _clone(self, offset, limit):
+        """Return a new QuerySet for the same query, with its own cache"""
+
+        clone = copy.copy(self)
+        clone.offset = offset
+        clone.limit = limit
+        clone._cache = []
+        clone._done = limit == 0
+        return clone
+
+    def _page_path(self, n):
+        """Return the request path for the page starting at offset n"""
+
+        if not self.paginate or not n:
+            return self.path
+        if self.path.endswith('?'):
+            separator = ''
         else:
-            return self.type()
+            separator = '&' if '?' in self.path else '?'
+        return '{}{}n={}'.format(self.path, separator, n)
 
-    @property
-    def is_editable(self):
-        """Boolean flag for whether or not this field is editable"""
+    @_bound
+    def _fetch_page(self):
+        """Fetch the next page of results into the cache"""
+
+        start = len(self._cache)
+        page = self._page(self.offset + start)
+        self._cache.extend(page)
+
+        if not self.paginate or len(page) < self.page_size:
+            self._done = True
+        if self.limit is not None and len(self._cache) >= self.limit:
+            del self._cache[self.limit:]
+            self._done = True
+
+        if self._prefetch:
+            self.model.prefetch(self._cache[start:], *self._prefetch, concurrency=self._prefetch_concurrency)
 
-        return self.type not in ('id', 'uneditable')
+    def _fetch_all(self):
+        """Fetch every remaining page"""
+
+        while not self._done:
+            self._fetch_page()
 
 
 class SubjectField(HighriseObject):
@@ -345,11 +2739,14 @@ class SubjectField(HighriseObject):
     def all(cls):
         """Get all custom fields"""
 
-        return cls._list('subject_fields.xml', 'subject-field')
+        return cls._cached('all', lambda: cls._list('subject_fields.xml', 'subject-field'))
 
 class Tag(HighriseObject):
     """An object representing a Highrise tag."""
 
+    plural = 'tags'
+    singular = 'tag'
+
     fields = {
         'id': HighriseField(type='id'),
         'name': HighriseField(),
@@ -359,7 +2756,13 @@ class Tag(HighriseObject):
     def all(cls):
         """Get all tags"""
 
-        return cls._list('tags.xml', 'tag')
+        return cls._cached('all', lambda: cls._list('tags.xml', 'tag'))
+
+    @classmethod
+    def aall(cls):
+        """Coroutine version of all()"""
+
+        return _aio().list_objects(cls, 'tags.xml', 'tag')
 
     @classmethod
     def get_by(cls, subject, subject_id):
@@ -368,50 +2771,179 @@ class Tag(HighriseObject):
         return cls._list('{}/{}/tags.xml'.format(subject, subject_id), 'tag')
 
     @classmethod
-    def add_to(cls, subject, subject_id, name):
-        """Add a tag to a specific person, company, case, or deal"""
+    def aget_by(cls, subject, subject_id):
+        """Coroutine version of get_by()"""
+
+        return _aio().list_objects(cls, '{}/{}/tags.xml'.format(subject, subject_id), 'tag')
+
+    @classmethod
+    def _name_xml(cls, name):
+        """Return the XML string for adding a tag called name"""
+
         xml = ElementTree.Element('name')
         xml.text = name
-        xml_string = ElementTree.tostring(xml, encoding=None)
+        return _xml_bytes(xml)
+
+    @classmethod
+    @_instrumented
+    def add_to(cls, subject, subject_id, name):
+        """Add a tag to a specific person, company, case, or deal"""
+
+        response = Highrise.request('{}/{}/tags.xml'.format(subject, subject_id), method='POST', xml=cls._name_xml(name))
 
-        response = Highrise.request('{}/{}/tags.xml'.format(subject, subject_id), method='POST', xml=xml_string)
+        # this may have created a new tag
+        cls.invalidate_cached('all')
         return cls.from_xml(response)
 
+    @classmethod
+    def aadd_to(cls, subject, subject_id, name):
+        """Coroutine version of add_to()"""
+
+        return _aio().add_tag(cls, subject, subject_id, name)
+
     @classmethod
     def remove_from(cls, subject, subject_id, tag_id):
         """Add a tag to a specific person, company, case, or deal"""
 
         return Highrise.request('{}/{}/tags/{}.xml'.format(subject, subject_id, tag_id), method='DELETE')
 
+    @classmethod
+    def aremove_from(cls, subject, subject_id, tag_id):
+        """Coroutine version of remove_from()"""
+
+        return _aio().request('{}/{}/tags/{}.xml'.format(subject, subject_id, tag_id), method='DELETE')
+
+    @classmethod
+    def bulk_add(cls, subject, subject_ids, names, concurrency=8, existing=None, list_members=False):
+        """Add every one of the tag names to every one of the people,
+        companies, cases or deals in subject_ids, using up to concurrency
+        requests in parallel.
+
+        Pairs that are already tagged are skipped. existing can map
+        subject ids to the tag names they are known to have; otherwise
+        the current tags of each subject are fetched first, or, with
+        list_members, the members of each tag (which takes fewer
+        requests for small tags on many people or companies). Returns a
+        summary dict with the number of tags added and skipped, and the
+        exception raised for each (subject_id, name) pair that failed."""
+
+        subject_ids, names = list(subject_ids), list(names)
+        if existing is not None:
+            tagged = existing
+        else:
+            tagged = cls._tagged(subject, subject_ids, names, concurrency, list_members)
+        pairs, skipped = cls._bulk_pairs(subject_ids, names, tagged, want=False)
+
+        results = _map_concurrent(lambda pair: cls.add_to(subject, pair[0], pair[1]), pairs, concurrency)
+        return cls._bulk_summary('added', pairs, results, skipped)
+
+    @classmethod
+    def bulk_remove(cls, subject, subject_ids, names, concurrency=8, existing=None, list_members=False):
+        """Remove every one of the tag names from the subjects in
+        subject_ids, skipping pairs that aren't tagged. Works like
+        bulk_add, and returns the same summary with a removed count."""
+
+        subject_ids, names = list(subject_ids), list(names)
+        tags = dict((tag.name, tag) for tag in cls.all())
+
+        # tags that don't exist can't be on anything
+        known = [name for name in names if name in tags]
+        if existing is not None:
+            tagged = existing
+        else:
+            tagged = cls._tagged(subject, subject_ids, known, concurrency, list_members)
+        pairs, skipped = cls._bulk_pairs(subject_ids, known, tagged, want=True)
+        skipped += len(subject_ids) * (len(names) - len(known))
+
+        def remove(pair):
+            return cls.remove_from(subject, pair[0], tags[pair[1]].id)
+
+        results = _map_concurrent(remove, pairs, concurrency)
+        return cls._bulk_summary('removed', pairs, results, skipped)
+
+    @classmethod
+    def _tagged(cls, subject, subject_ids, names, concurrency, list_members=False):
+        """Return a dict of the tag names, out of names, that each subject
+        has.
+
+        The tags of every subject are fetched, one request each. People
+        and companies can also be listed by tag, so with list_members the
+        members of each tag are listed instead, a page of 500 per request,
+        however many of them there are."""
+
+        tagged = dict((subject_id, set()) for subject_id in subject_ids)
+        keys = dict((text_type(subject_id), subject_id) for subject_id in tagged)
+        model = {'people': Person, 'companies': Company}.get(subject)
+        tags = [tag for tag in cls.all() if tag.name in names]
+
+        if model is not None and list_members:
+            def members(tag):
+                path = '/{}.xml?tag_id={}'.format(subject, tag.id)
+                return [obj.id for obj in QuerySet(model, path, model.singular).iterator()]
+
+            for tag, (ids, error) in zip(tags, _map_concurrent(members, tags, concurrency)):
+                if error is not None:
+                    raise error
+                for id in ids:
+                    key = keys.get(text_type(id))
+                    if key is not None:
+                        tagged[key].add(tag.name)
+
+        else:
+            subjects = list(tagged)
+            results = _map_concurrent(lambda subject_id: cls.get_by(subject, subject_id), subjects, concurrency)
+            for subject_id, (subject_tags, error) in zip(subjects, results):
+                if error is not None:
+                    raise error
+                tagged[subject_id].update(tag.name for tag in subject_tags if tag.name in names)
+
+        return tagged
+
+    @staticmethod
+    def _bulk_pairs(subject_ids, names, tagged, want):
+        """Return the (subject_id, name) pairs whose tagged state is want,
+        and how many were skipped because it isn't"""
+
+        pairs = []
+        skipped = 0
+        for subject_id in subject_ids:
+            has = tagged.get(subject_id) or ()
+            for name in names:
+                if (name in has) == want:
+                    pairs.append((subject_id, name))
+                else:
+                    skipped += 1
+        return pairs, skipped
+
+    @staticmethod
+    def _bulk_summary(done, pairs, results, skipped):
+        """Summarize the results of a bulk tag operation"""
+
+        errors = dict((pair, error) for pair, (result, error) in zip(pairs, results) if error is not None)
+        return {done: len(pairs) - len(errors), 'skipped': skipped, 'errors': errors}
+
 
 class Message(HighriseObject):
     """An object representing a Highrise email or note."""
 
-    def __new__(cls, extended_fields={}, **kwargs):
-        """Set object attributes for subclasses of Party (companies and people)"""
-
-        # set the base fields dictionary and extend it with any additional fields
-        cls.fields = {
-            'id': HighriseField(type='id'),
-            'body': HighriseField(type=str),
-            'author_id': HighriseField(),
-            'subject_id': HighriseField(type=int),
-            'subject_type': HighriseField(type=str, options=('Party', 'Deal', 'Kase')),
-            'subject_name': HighriseField(),
-            'collection_id': HighriseField(type=int),
-            'collection_type': HighriseField(type=str, options=('Deal', 'Kase')),
-            'visible_to': HighriseField(type=str, options=('Everyone', 'Owner', 'NamedGroup')),
-            'owner_id': HighriseField(type=int),
-            'group_id': HighriseField(type=int),
-            'created_at': HighriseField(type=datetime),
-            'updated_at': HighriseField(),
-        }
-        cls.fields.update(extended_fields)
-
-        # send back the object reference
-        return HighriseObject.__new__(cls)
+    fields = {
+        'id': HighriseField(type='id'),
+        'body': HighriseField(type=str),
+        'author_id': HighriseField(),
+        'subject_id': HighriseField(type=int),
+        'subject_type': HighriseField(type=str, options=('Party', 'Deal', 'Kase')),
+        'subject_name': HighriseField(),
+        'collection_id': HighriseField(type=int),
+        'collection_type': HighriseField(type=str, options=('Deal', 'Kase')),
+        'visible_to': HighriseField(type=str, options=('Everyone', 'Owner', 'NamedGroup')),
+        'owner_id': HighriseField(type=int),
+        'group_id': HighriseField(type=int),
+        'created_at': HighriseField(type=datetime),
+        'updated_at': HighriseField(),
+    }
 
     @classmethod
+    @_instrumented
     def get(cls, id):
         """Get a single message"""
 
@@ -422,10 +2954,28 @@ class Message(HighriseObject):
         for obj_xml in xml.iter(tag=cls.singular):
             return cls.from_xml(obj_xml)
 
+    @classmethod
+    def aget(cls, id):
+        """Coroutine version of get()"""
+
+        return _aio().get(cls, id)
+
     @classmethod
     def filter(cls, **kwargs):
         """Get a list of messages based by subject"""
 
+        return cls._list(cls._filter_path(**kwargs), cls.singular)
+
+    @classmethod
+    def afilter(cls, **kwargs):
+        """Coroutine version of filter()"""
+
+        return _aio().list_objects(cls, cls._filter_path(**kwargs), cls.singular)
+
+    @classmethod
+    def _filter_path(cls, **kwargs):
+        """Return the request path for filter()"""
+
         # map kwarg to URL slug for request
         kwarg_to_path = {
             'person': 'people',
@@ -442,35 +2992,29 @@ class Message(HighriseObject):
         else:
             raise KeyError('filter method must have person, company, kase, or deal as an kwarg')
 
-        # return the list of messages from Highrise
-        return cls._list(path, cls.singular)
+        return path
 
-    def save(self, **kwargs):
-        """Save a message to Highrise."""
+    def save(self, refetch='auto', **kwargs):
+        """Save a message to Highrise. See HighriseObject._save for refetch."""
 
-        # get the XML for the request
-        xml = self.save_xml()
-        xml_string = ElementTree.tostring(xml, encoding=None)
+        self._save(refetch, **kwargs)
 
-        # if this was an initial save, update the object with the returned data
-        if self.id == None:
-            response = Highrise.request('/{}.xml'.format(self.plural), method='POST', xml=xml_string, **kwargs)
-            new = self.from_xml(response)
-
-        # if this was a PUT request, we need to re-request the object
-        # so we can get any new ID values set at ceation
-        else:
-            response = Highrise.request('/{}/{}.xml'.format(self.plural, self.id), method='PUT', xml=xml_string, **kwargs)
-            new = cls.get(self.id)
+    def asave(self, **kwargs):
+        """Coroutine version of save()"""
 
-        # update the values of self to align with what came back from Highrise
-        self.__dict__ = new.__dict__
+        return _aio().save(self, **kwargs)
 
+    @_bound
     def delete(self):
         """Delete a message from Highrise."""
 
         return Highrise.request('/{}/{}.xml'.format(self.plural, self.id), method='DELETE')
 
+    def adelete(self):
+        """Coroutine version of delete()"""
+
+        return _aio().delete(self)
+
 
 class Note(Message):
     """An object representing a Highrise note"""
@@ -485,16 +3029,23 @@ class Email(Message):
     plural = 'emails'
     singular = 'email'
 
-    def __new__(cls, **kwargs):
-        extended_fields = {
-            'title': HighriseField(type=str),
-        }
-        return Message.__new__(cls, extended_fields, **kwargs)
+    fields = dict(Message.fields, **{
+        'title': HighriseField(type=str),
+    })
 
 
 class Deal(HighriseObject):
     """An object representing a Highrise deal."""
 
+    plural = 'deals'
+    singular = 'deal'
+
+    _relations = {
+        'notes': lambda deal: Note.filter(deal=deal.id),
+        'tasks': lambda deal: Task.filter(deal=deal.id),
+        'emails': lambda deal: Email.filter(deal=deal.id),
+    }
+
     fields = {
         'id': HighriseField(type='id'),
         'account_id': HighriseField(),
@@ -526,6 +3077,13 @@ class Deal(HighriseObject):
         return cls._list('deals.xml', 'deal')
 
     @classmethod
+    def aall(cls):
+        """Coroutine version of all()"""
+
+        return _aio().list_objects(cls, 'deals.xml', 'deal')
+
+    @classmethod
+    @_instrumented
     def get(cls, id):
         """Get a single deal"""
 
@@ -536,6 +3094,12 @@ class Deal(HighriseObject):
         for deal_xml in xml.iter(tag='deal'):
             return Deal.from_xml(deal_xml)
 
+    @classmethod
+    def aget(cls, id):
+        """Coroutine version of get()"""
+
+        return _aio().get(cls, id)
+
     @property
     def notes(self):
         """Get the notes associated with this deal"""
@@ -545,7 +3109,7 @@ class Deal(HighriseObject):
             raise ElevatorError('You have to save the deal before you can load its notes')
 
         # get the notes
-        return Note.filter(deal=self.id)
+        return self._relation('notes')
 
     @property
     def tasks(self):
@@ -556,7 +3120,7 @@ class Deal(HighriseObject):
             raise ElevatorError('You have to save the deal before you can load its tasks')
 
         # get the notes
-        return Task.filter(deal=self.id)
+        return self._relation('tasks')
 
     @property
     def emails(self):
@@ -567,29 +3131,19 @@ class Deal(HighriseObject):
             raise ElevatorError('You have to save the deal before you can load its emails')
 
         # get the emails
-        return Email.filter(deal=self.id)
-
-    def save(self, **kwargs):
-        """Save a deal to Highrise."""
+        return self._relation('emails')
 
-        # get the XML for the request
-        xml = self.save_xml()
-        xml_string = ElementTree.tostring(xml, encoding=None)
+    def save(self, refetch='auto', **kwargs):
+        """Save a deal to Highrise. See HighriseObject._save for refetch."""
 
-        # if this was an initial save, update the object with the returned data
-        if self.id == None:
-            response = Highrise.request('/deals.xml', method='POST', xml=xml_string, **kwargs)
-            new = Deal.from_xml(response)
+        self._save(refetch, **kwargs)
 
-        # if this was a PUT request, we need to re-request the object
-        # so we can get any new ID values set at ceation
-        else:
-            response = Highrise.request('/deals/{}.xml'.format(self.id), method='PUT', xml=xml_string, **kwargs)
-            new = Deal.get(self.id)
+    def asave(self, **kwargs):
+        """Coroutine version of save()"""
 
-        # update the values of self to align with what came back from Highrise
-        self.__dict__ = new.__dict__
+        return _aio().save(self, **kwargs)
 
+    @_bound
     def set_status(self, status):
         """Change the status of a deal"""
 
@@ -598,11 +3152,12 @@ class Deal(HighriseObject):
         xml_name = ElementTree.Element('name')
         xml_name.text = status
         xml.insert(0, xml_name)
-        xml_string = ElementTree.tostring(xml, encoding=None)
+        xml_string = _xml_bytes(xml)
 
         # submit the PUT request
         response = Highrise.request('/deals/{}/status.xml'.format(self.id), method='PUT', xml=xml_string)
 
+    @_bound
     def add_note(self, body, **kwargs):
         """Add a note to a deal"""
 
@@ -614,6 +3169,11 @@ class Deal(HighriseObject):
         note = Note(body=body, subject_id=self.id, subject_type='Deal', **kwargs)
         note.save()
 
+        notes = self._related_loaded('notes')
+        if notes is not None:
+            notes.append(note)
+
+    @_bound
     def add_email(self, title, body, **kwargs):
         """Add an email to a deal"""
 
@@ -625,11 +3185,21 @@ class Deal(HighriseObject):
         email = Email(title=title, body=body, subject_id=self.id, subject_type='Deal', **kwargs)
         email.save()
 
+        emails = self._related_loaded('emails')
+        if emails is not None:
+            emails.append(email)
+
+    @_bound
     def delete(self):
         """Delete a deal from Highrise."""
 
         return Highrise.request('/deals/{}.xml'.format(self.id), method='DELETE')
 
+    def adelete(self):
+        """Coroutine version of delete()"""
+
+        return _aio().delete(self)
+
 
 
 class Task(HighriseObject):
@@ -663,6 +3233,13 @@ class Task(HighriseObject):
         return cls._list('tasks.xml', 'task')
 
     @classmethod
+    def aall(cls):
+        """Coroutine version of all()"""
+
+        return _aio().list_objects(cls, 'tasks.xml', 'task')
+
+    @classmethod
+    @_instrumented
     def get(cls, id):
         """Get a single task"""
 
@@ -673,36 +3250,52 @@ class Task(HighriseObject):
         for task_xml in xml.iter(tag='task'):
             return Task.from_xml(task_xml)
 
-    def save(self, **kwargs):
-        """Save a task to Highrise."""
+    @classmethod
+    def aget(cls, id):
+        """Coroutine version of get()"""
 
-        # get the XML for the request
-        xml = self.save_xml()
-        xml_string = ElementTree.tostring(xml, encoding=None)
+        return _aio().get(cls, id)
 
-        # if this was an initial save, update the object with the returned data
-        if self.id == None:
-            response = Highrise.request('/tasks.xml', method='POST', xml=xml_string, **kwargs)
-            new = Task.from_xml(response)
+    def save(self, refetch='auto', **kwargs):
+        """Save a task to Highrise. See HighriseObject._save for refetch."""
 
-        # if this was a PUT request, we need to re-request the object
-        # so we can get any new ID values set at ceation
-        else:
-            response = Highrise.request('/tasks/{}.xml'.format(self.id), method='PUT', xml=xml_string, **kwargs)
-            new = Task.get(self.id)
+        self._save(refetch, **kwargs)
 
-        # update the values of self to align with what came back from Highrise
-        self.__dict__ = new.__dict__
+    def asave(self, **kwargs):
+        """Coroutine version of save()"""
 
+        return _aio().save(self, **kwargs)
+
+    @_bound
     def delete(self):
         """Delete a task from Highrise."""
 
         return Highrise.request('/tasks/{}.xml'.format(self.id), method='DELETE')
 
+    def adelete(self):
+        """Coroutine version of delete()"""
+
+        return _aio().delete(self)
+
     @classmethod
     def filter(cls, **kwargs):
         """Get a list of tasks based by subject"""
 
+        mirrored = Highrise._mirrored(cls, **kwargs)
+        if mirrored is not None:
+            return mirrored
+        return cls._list(cls._filter_path(**kwargs), cls.singular)
+
+    @classmethod
+    def afilter(cls, **kwargs):
+        """Coroutine version of filter()"""
+
+        return _aio().list_objects(cls, cls._filter_path(**kwargs), cls.singular)
+
+    @classmethod
+    def _filter_path(cls, **kwargs):
+        """Return the request path for filter()"""
+
         # map kwarg to URL slug for request
         kwarg_to_path = {
             'person': 'people',
@@ -719,8 +3312,7 @@ class Task(HighriseObject):
         else:
             raise KeyError('filter method must have person, company, kase, or deal as an kwarg')
 
-        # return the list of messages from Highrise
-        return cls._list(path, cls.singular)
+        return path
 
 
 class ContactData(HighriseObject):
@@ -834,6 +3426,9 @@ class SubjectData(HighriseObject):
 class Case(HighriseObject):
     """An object representing a Highrise Case."""
 
+    plural = 'kases'
+    singular = 'kase'
+
     fields = {
         'id': HighriseField(type='id'),
         'author_id': HighriseField(type=int),
@@ -841,7 +3436,7 @@ class Case(HighriseObject):
         'created_at': HighriseField(type=datetime),
         'updated_at': HighriseField(type=datetime),
         'name': HighriseField(type=str),
-        'visible-to': HighriseField(type=str),
+        'visible_to': HighriseField(type=str),
         'group_id': HighriseField(type=int),
         'owner_id': HighriseField(type=int),
         'parties': HighriseField(type=list)
@@ -854,6 +3449,13 @@ class Case(HighriseObject):
         return cls._list('kases/open.xml', 'kase')
 
     @classmethod
+    def aall(cls):
+        """Coroutine version of all()"""
+
+        return _aio().list_objects(cls, 'kases/open.xml', 'kase')
+
+    @classmethod
+    @_instrumented
     def get(cls, id):
         """Get a single case"""
 
@@ -861,84 +3463,98 @@ class Case(HighriseObject):
         xml = Highrise.request('/kases/{}.xml'.format(id))
 
         # return a case object
-        for case_xml in xml.getiterator(tag='kase'):
+        for case_xml in xml.iter(tag='kase'):
             return Case.from_xml(case_xml)
 
-    def save(self):
-        """Save a case to Highrise."""
+    @classmethod
+    def aget(cls, id):
+        """Coroutine version of get()"""
 
-        # get the XML for the request
-        xml = self.save_xml()
-        xml_string = ElementTree.tostring(xml, encoding=None)
+        return _aio().get(cls, id)
 
-        # if this was an initial save, update the object with the returned data
-        if self.id == None:
-            response = Highrise.request('/kases.xml', method='POST', xml=xml_string)
-            new = Case.from_xml(response)
+    def save(self, refetch='auto', **kwargs):
+        """Save a case to Highrise. See HighriseObject._save for refetch."""
 
-        # if this was a PUT request, we need to re-request the object
-        # so we can get any new ID values set at creation
-        else:
-            response = Highrise.request('/kases/{}.xml'.format(self.id), method='PUT', xml=xml_string)
-            new = Case.get(self.id)
+        self._save(refetch, **kwargs)
 
-        # update the values of self to align with what came back from Highrise
-        self.__dict__ = new.__dict__
+    def asave(self, **kwargs):
+        """Coroutine version of save()"""
 
+        return _aio().save(self, **kwargs)
+
+    @_bound
     def delete(self):
         """Delete a task from Highrise."""
 
         return Highrise.request('/kases/{}.xml'.format(self.id), method='DELETE')
 
+    def adelete(self):
+        """Coroutine version of delete()"""
+
+        return _aio().delete(self)
+
 class Party(HighriseObject):
     """An object representing a Highrise person or company."""
 
     singular = 'party'
     plural = 'parties'
 
-    def __new__(cls, extended_fields={}, **kwargs):
-        """Set object attributes for subclasses of Party (companies and people)"""
-
-        # set the base fields dictionary and extend it with any additional fields
-        cls.fields = {
-            'id': HighriseField(type='id'),
-            'background': HighriseField(type=str),
-            'visible_to': HighriseField(type=str, options=('Everyone', 'Owner', 'NamedGroup')),
-            'owner_id': HighriseField(type=int),
-            'group_id': HighriseField(type=int),
-            'contact_data': HighriseField(type=ContactData),
-            'avatar_url': HighriseField(type=str),
-            'author_id': HighriseField(),
-            'created_at': HighriseField(),
-            'updated_at': HighriseField()
-        }
-        cls.fields.update(extended_fields)
+    _relations = {
+        'tags': lambda party: Tag.get_by(party.plural, party.id),
+        'notes': lambda party: Note.filter(**{party.singular: party.id}),
+        'tasks': lambda party: Task.filter(**{party.singular: party.id}),
+        'emails': lambda party: Email.filter(**{party.singular: party.id}),
+    }
 
-        # send back the object reference
-        return HighriseObject.__new__(cls)
+    fields = {
+        'id': HighriseField(type='id'),
+        'background': HighriseField(type=str),
+        'visible_to': HighriseField(type=str, options=('Everyone', 'Owner', 'NamedGroup')),
+        'owner_id': HighriseField(type=int),
+        'group_id': HighriseField(type=int),
+        'contact_data': HighriseField(type=ContactData),
+        'avatar_url': HighriseField(type=str),
+        'author_id': HighriseField(),
+        'created_at': HighriseField(),
+        'updated_at': HighriseField()
+    }
 
     @classmethod
     def all(cls, offset=None):
-        """Get all parties"""
+        """Get all parties, as a lazy QuerySet.
+
+        If offset is given, only the single page starting there is returned."""
 
         if offset:
-            return cls._list('{}.xml?n={}'.format(cls.plural, offset), cls.singular)
+            return QuerySet(cls, '{}.xml'.format(cls.plural), cls.singular, offset=offset, limit=QuerySet.page_size)
         else:
-            return cls._list('{}.xml'.format(cls.plural), cls.singular)
+            return QuerySet(cls, '{}.xml'.format(cls.plural), cls.singular)
+
+    @classmethod
+    def aall(cls, offset=None):
+        """Coroutine version of all(), returning every page as a list"""
+
+        return _aio().fetch(cls.all(offset))
 
     @classmethod
     def filter(cls, **kwargs):
-        """Get a list of parties based on filter criteria"""
+        """Get a lazy QuerySet of parties based on filter criteria.
+
+        If n is given, only the single page starting at that offset is returned."""
+
+        # answer from the local mirror if it is fresh enough
+        mirrored = Highrise._mirrored(cls, **kwargs)
+        if mirrored is not None:
+            return mirrored
 
         # if company_id or title are present in kwargs, we should be running
         # this against the Person object directly
         if ('company_id' in kwargs or 'title' in kwargs):
             return Person._filter(**kwargs)
 
-        paging = ''
+        paging = {}
         if 'n' in kwargs:
-            n = kwargs.pop('n')
-            paging = '&n=%d' % n
+            paging = {'offset': kwargs.pop('n'), 'limit': QuerySet.page_size}
 
         # get the path for filter methods that only take a single argument
         if 'term' in kwargs:
@@ -952,8 +3568,8 @@ class Party(HighriseObject):
                 raise KeyError('"tag_id" can not be used with any other keyward arguments')
 
         elif 'since' in kwargs:
-            paging = '' # since does not page results
-            path = '/{}.xml?since={}'.format(cls.plural, datetime.strftime(Highrise.from_utc(kwargs['since']), '%Y%m%d%H%M%S'))
+            paging = {'paginate': False} # since does not page results
+            path = '/{}.xml?since={}'.format(cls.plural, datetime.strftime(Highrise.to_utc(kwargs['since']), '%Y%m%d%H%M%S'))
             if len(kwargs) > 1:
                 raise KeyError('"since" can not be used with any other keyward arguments')
 
@@ -968,10 +3584,17 @@ class Party(HighriseObject):
                 # allow filtering by 'n' alone without using search.xml
                 path = '/{}.xml?'.format(cls.plural)
 
-        # return the list of people from Highrise
-        return cls._list(path+paging, cls.singular)
+        # return the people from Highrise
+        return QuerySet(cls, path, cls.singular, **paging)
+
+    @classmethod
+    def afilter(cls, **kwargs):
+        """Coroutine version of filter(), returning every page as a list"""
+
+        return _aio().fetch(cls.filter(**kwargs))
 
     @classmethod
+    @_instrumented
     def get(cls, id):
         """Get a single party"""
 
@@ -982,6 +3605,12 @@ class Party(HighriseObject):
         for obj_xml in xml.iter(tag=cls.singular):
             return cls.from_xml(obj_xml)
 
+    @classmethod
+    def aget(cls, id):
+        """Coroutine version of get()"""
+
+        return _aio().get(cls, id)
+
     @property
     def tags(self):
         """Get the tags associated with this party"""
@@ -991,7 +3620,7 @@ class Party(HighriseObject):
             raise ElevatorError('You have to save the person before you can load their tags')
 
         # get the tags
-        return Tag.get_by(self.plural, self.id)
+        return self._relation('tags')
 
     @property
     def notes(self):
@@ -1002,9 +3631,7 @@ class Party(HighriseObject):
             raise ElevatorError('You have to save the person before you can load their notes')
 
         # get the notes
-        kwargs = {}
-        kwargs[self.singular] = self.id
-        return Note.filter(**kwargs)
+        return self._relation('notes')
 
     @property
     def tasks(self):
@@ -1015,9 +3642,7 @@ class Party(HighriseObject):
             raise ElevatorError('You have to save the person before you can load their tasks')
 
         # get the notes
-        kwargs = {}
-        kwargs[self.singular] = self.id
-        return Task.filter(**kwargs)
+        return self._relation('tasks')
 
     @property
     def emails(self):
@@ -1028,10 +3653,9 @@ class Party(HighriseObject):
             raise ElevatorError('You have to save the person before you can load their emails')
 
         # get the emails
-        kwargs = {}
-        kwargs[self.singular] = self.id
-        return Email.filter(**kwargs)
+        return self._relation('emails')
 
+    @_bound
     def add_tag(self, name):
         """Add a tag to a party"""
 
@@ -1039,9 +3663,14 @@ class Party(HighriseObject):
         if self.id == None:
             raise ElevatorError('You have to save the {} before you can add a tag'.format(self.singular))
 
-        # add the tag
-        return Tag.add_to(self.plural, self.id, name)
+        # add the tag, and to the tags we have already loaded
+        tag = Tag.add_to(self.plural, self.id, name)
+        tags = self._related_loaded('tags')
+        if tags is not None and not any(loaded.id == tag.id for loaded in tags):
+            tags.append(tag)
+        return tag
 
+    @_bound
     def remove_tag(self, tag_id):
         """Remove a tag from a party"""
 
@@ -1049,9 +3678,14 @@ class Party(HighriseObject):
         if self.id == None:
             raise ElevatorError('You have to save the {} before you can remove a tag'.format(self.singular))
 
-        # remove the tag
-        return Tag.remove_from(self.plural, self.id, tag_id)
+        # remove the tag, and from the tags we have already loaded
+        result = Tag.remove_from(self.plural, self.id, tag_id)
+        tags = self._related_loaded('tags')
+        if tags is not None:
+            tags[:] = [tag for tag in tags if text_type(tag.id) != text_type(tag_id)]
+        return result
 
+    @_bound
     def add_note(self, body, **kwargs):
         """Add a note to a party"""
 
@@ -1063,6 +3697,11 @@ class Party(HighriseObject):
         note = Note(body=body, subject_id=self.id, subject_type='Party', **kwargs)
         note.save()
 
+        notes = self._related_loaded('notes')
+        if notes is not None:
+            notes.append(note)
+
+    @_bound
     def add_email(self, title, body, **kwargs):
         """Add an email to a party"""
 
@@ -1074,32 +3713,31 @@ class Party(HighriseObject):
         email = Email(title=title, body=body, subject_id=self.id, subject_type='Party', **kwargs)
         email.save()
 
-    def save(self, **kwargs):
-        """Save a party to Highrise."""
+        emails = self._related_loaded('emails')
+        if emails is not None:
+            emails.append(email)
 
-        # get the XML for the request
-        xml = self.save_xml()
-        xml_string = ElementTree.tostring(xml, encoding=None)
+    def save(self, refetch='auto', **kwargs):
+        """Save a party to Highrise. See HighriseObject._save for refetch."""
 
-        # if this was an initial save, update the object with the returned data
-        if self.id == None:
-            response = Highrise.request('/{}.xml'.format(self.plural), method='POST', xml=xml_string, **kwargs)
-            new = Person.from_xml(response)
+        self._save(refetch, **kwargs)
 
-        # if this was a PUT request, we need to re-request the object
-        # so we can get any new ID values for phone numbers, addresses, etc.
-        else:
-            response = Highrise.request('/{}/{}.xml'.format(self.plural, self.id), method='PUT', xml=xml_string, **kwargs)
-            new = self.get(self.id)
+    def asave(self, **kwargs):
+        """Coroutine version of save()"""
 
-        # update the values of self to align with what came back from Highrise
-        self.__dict__ = new.__dict__
+        return _aio().save(self, **kwargs)
 
+    @_bound
     def delete(self):
         """Delete a party from Highrise."""
 
         return Highrise.request('/{}/{}.xml'.format(self.plural, self.id), method='DELETE')
 
+    def adelete(self):
+        """Coroutine version of delete()"""
+
+        return _aio().delete(self)
+
 
 class Person(Party):
     """An object representing a Highrise person"""
@@ -1107,16 +3745,14 @@ class Person(Party):
     plural = 'people'
     singular = 'person'
 
-    def __new__(cls, **kwargs):
-        extended_fields = {
-            'first_name': HighriseField(type=str),
-            'last_name': HighriseField(type=str),
-            'title': HighriseField(type=str),
-            'company_id': HighriseField(type=int),
-            'company_name': HighriseField(type=str),
-            'subject_datas': HighriseField(type=list, force_key='subject_datas', extra_attrs={'type': 'array'}),
-        }
-        return Party.__new__(cls, extended_fields, **kwargs)
+    fields = dict(Party.fields, **{
+        'first_name': HighriseField(type=str),
+        'last_name': HighriseField(type=str),
+        'title': HighriseField(type=str),
+        'company_id': HighriseField(type=int),
+        'company_name': HighriseField(type=str),
+        'subject_datas': HighriseField(type=list, force_key='subject_datas', extra_attrs={'type': 'array'}),
+    })
 
     @classmethod
     def _filter(cls, **kwargs):
@@ -1134,8 +3770,8 @@ class Person(Party):
             if len(kwargs) > 1:
                 raise KeyError('"title" can not be used with any other keyward arguments')
 
-        # return the list of people from Highrise
-        return cls._list(path, 'person')
+        # return the people from Highrise
+        return QuerySet(cls, path, 'person', paginate=False)
 
 
 class Company(Party):
@@ -1144,12 +3780,10 @@ class Company(Party):
     plural = 'companies'
     singular = 'company'
 
-    def __new__(cls, **kwargs):
-        extended_fields = {
-            'name': HighriseField(type=str),
-            'subject_datas': HighriseField(type=list, force_key='subject_datas', extra_attrs={'type': 'array'}),
-        }
-        return Party.__new__(cls, extended_fields, **kwargs)
+    fields = dict(Party.fields, **{
+        'name': HighriseField(type=str),
+        'subject_datas': HighriseField(type=list, force_key='subject_datas', extra_attrs={'type': 'array'}),
+    })
 
 
 class User(HighriseObject):
@@ -1180,25 +3814,26 @@ class User(HighriseObject):
     singular = 'user'
     plural = 'users'
 
-    def __new__(cls, extended_fields={}, **kwargs):
-        # set the base fields dictionary and extend it with any additional fields
-        cls.fields = {
-            'id': HighriseField(type='id'),
-            'name': HighriseField(type=str),
-            'email_address': HighriseField(type=str),
-            'created_at': HighriseField(),
-            'updated_at': HighriseField(),
-            'admin': HighriseField(type=bool)
-        }
-        cls.fields.update(extended_fields)
-
-        # send back the object reference
-        return HighriseObject.__new__(cls)
+    fields = {
+        'id': HighriseField(type='id'),
+        'name': HighriseField(type=str),
+        'email_address': HighriseField(type=str),
+        'created_at': HighriseField(),
+        'updated_at': HighriseField(),
+        'admin': HighriseField(type=bool)
+    }
 
     @classmethod
     def get(cls, id):
         """Get a single user by id."""
 
+        return cls._cached(id, lambda: cls._get(id))
+
+    @classmethod
+    @_instrumented
+    def _get(cls, id):
+        """Get a single user by id from Highrise, bypassing the cache"""
+
         # retrieve the person from Highrise
         xml = Highrise.request('/{}/{}.xml'.format(cls.plural, id))
 
@@ -1207,6 +3842,509 @@ class User(HighriseObject):
             return cls.from_xml(obj_xml)
 
 
+def _as_datetime(value):
+    """Convert a datetime value in any of the datetime modes to a datetime"""
+
+    if isinstance(value, datetime) or value is None:
+        return value
+    if isinstance(value, int):
+        return Highrise.from_utc(datetime.utcfromtimestamp(value))
+    return _parse_datetime(value)
+
+
+class MemoryStore(object):
+    """A SyncEngine store that keeps the latest version of every record
+    in a dictionary, keyed by (class name, id)"""
+
+    def __init__(self):
+        self.objects = {}
+
+    def upsert(self, obj):
+        self.objects[(type(obj).__name__, obj.id)] = obj
+
+
+class JSONSyncState(object):
+    """SyncEngine high-water marks, saved to a JSON file after every change"""
+
+    def __init__(self, path):
+        self.path = path
+        self._marks = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self._marks = json.load(f)
+
+    def get(self, name, default=None):
+        value = self._marks.get(name)
+        if value is None:
+            return default
+        return datetime.strptime(value, '%Y-%m-%dT%H:%M:%S')
+
+    def __setitem__(self, name, value):
+        self._marks[name] = datetime.strftime(value, '%Y-%m-%dT%H:%M:%S')
+
+        # write a new file and move it into place, so a crash can't leave half a file
+        temp_path = '{}.tmp'.format(self.path)
+        with open(temp_path, 'w') as f:
+            json.dump(self._marks, f, indent=2, sort_keys=True)
+        getattr(os, 'replace', os.rename)(temp_path, self.path)
+
+
+class SyncEngine(object):
+    """Keeps a local store up to date with changes in Highrise.
+
+    Every run fetches the records of each model that changed since the
+    model's high-water mark (the newest updated_at seen so far), passes
+    each one to store.upsert(obj) and then moves the mark forward in
+    state. state can be a dict, or a JSONSyncState to keep the marks
+    between runs. If the store has a synced(model, mark) method, it is
+    called after each model is brought up to date.
+
+    People and companies are fetched with filter(since=...). Highrise
+    doesn't page those results, so when a full page comes back the query
+    is repeated from the newest updated_at in it until a short page
+    arrives. Highrise has no equivalent for deals, cases and tasks, so
+    all of them are downloaded, a page at a time and including closed
+    cases, and only the changed ones are applied."""
+
+    def __init__(self, store, state, models=None):
+        self.store = store
+        self.state = state
+        self.models = models if models is not None else (Person, Company, Deal, Case, Task)
+
+    def run(self):
+        """Sync every model and return how many records were applied for each"""
+
+        return dict((model.__name__, self.sync(model)) for model in self.models)
+
+    def sync(self, model):
+        """Sync one model and return how many records were applied"""
+
+        mark = self.state.get(model.__name__)
+        if mark is None or not issubclass(model, Party):
+            count, mark = self._sync_all(model, mark)
+        else:
+            count, mark = self._sync_since(model, mark)
+
+        synced = getattr(self.store, 'synced', None)
+        if synced is not None:
+            synced(model, mark)
+        return count
+
+    def _apply(self, model, objects, mark):
+        """Apply changed objects to the store, and return how many there
+        were along with the new high-water mark"""
+
+        count = 0
+        newest = mark
+        for obj in objects:
+            updated_at = _as_datetime(getattr(obj, 'updated_at', None))
+            if mark is not None and updated_at is not None and updated_at < mark:
+                continue
+            self.store.upsert(obj)
+            count += 1
+            if updated_at is not None and (newest is None or updated_at > newest):
+                newest = updated_at
+
+        if newest is not None and newest != mark:
+            self.state[model.__name__] = newest
+        return count, newest
+
+    def _sync_all(self, model, mark):
+        """Download every record of a model, applying the changed ones"""
+
+        return self._apply(model, self._records(model), mark)
+
+    def _records(self, model):
+        """Yield every record of a model, paging through the lists that
+        all() only returns the first page or the open records of"""
+
+        if model is Deal:
+            paths = ['deals.xml']
+        elif model is Case:
+            paths = ['kases/open.xml', 'kases/closed.xml']
+        else:
+            objects = model.all()
+            for obj in objects.iterator() if isinstance(objects, QuerySet) else objects:
+                yield obj
+            return
+
+        for path in paths:
+            for obj in QuerySet(model, path, model.singular).iterator():
+                yield obj
+
+    def _sync_since(self, model, mark):
+        """Fetch only the records that changed since mark"""
+
+        total = 0
+        while True:
+            batch = list(model.filter(since=mark))
+            count, newest = self._apply(model, batch, mark)
+            total += count
+
+            # a short page means we have everything; a full page that
+            # didn't move the mark forward means we can't get any further
+            if len(batch) < QuerySet.page_size or newest == mark:
+                return total, newest
+            mark = newest
+
+
+class MirrorQuerySet(QuerySet):
+    """A QuerySet answered from a SQLiteMirror instead of Highrise, a page
+    at a time with LIMIT and OFFSET"""
+
+    def __init__(self, mirror, model, sql, params, offset=0, limit=None):
+        super(MirrorQuerySet, self).__init__(model, None, model.singular, offset=offset, limit=limit)
+        self.mirror = mirror
+        self.sql = sql
+        self.params = params
+
+    def __repr__(self):
+        return '<MirrorQuerySet {} {}>'.format(self.model.__name__, self.mirror.path)
+
+    def _page(self, n):
+        """Return the objects of the page starting at offset n"""
+
+        return self.mirror._load(self.sql + ' LIMIT ? OFFSET ?', list(self.params) + [self.page_size, n])
+
+    def _stream(self, n):
+        """Return an iterator over the page starting at offset n"""
+
+        return iter(self._page(n))
+
+
+class SQLiteMirror(object):
+    """A local SQLite copy of people, companies, deals and tasks.
+
+    The mirror is a SyncEngine store, so a SyncEngine keeps it up to
+    date. Parties are indexed by name, title, company, email address,
+    phone number, address and tag, and once the mirror has been passed
+    to Highrise.set_mirror, Party.filter() and Task.filter() are
+    answered from it without a request while it is fresh, i.e. while
+    the last sync of every model a query needs is less than max_age
+    seconds old. Queries it can't answer, and every query once it goes
+    stale, fall back to the API.
+
+    Party.filter() then returns a MirrorQuerySet, which reads the
+    results 500 at a time like the API does. A term matches the start
+    of a name or email address and criteria match whole values, both
+    ignoring case, so the indexes can answer them."""
+
+    _schema = '''
+        CREATE TABLE IF NOT EXISTS parties (
+            id INTEGER PRIMARY KEY, type TEXT, name TEXT, first_name TEXT,
+            last_name TEXT, title TEXT, company_id INTEGER, updated_at TEXT, data BLOB);
+        CREATE INDEX IF NOT EXISTS parties_type ON parties (type);
+        CREATE INDEX IF NOT EXISTS parties_name_nocase ON parties (name COLLATE NOCASE);
+        CREATE INDEX IF NOT EXISTS parties_first_name_nocase ON parties (first_name COLLATE NOCASE);
+        CREATE INDEX IF NOT EXISTS parties_last_name_nocase ON parties (last_name COLLATE NOCASE);
+        CREATE INDEX IF NOT EXISTS parties_title ON parties (title);
+        CREATE INDEX IF NOT EXISTS parties_company ON parties (company_id);
+        CREATE INDEX IF NOT EXISTS parties_updated ON parties (updated_at);
+        CREATE TABLE IF NOT EXISTS party_emails (party_id INTEGER, address TEXT);
+        CREATE INDEX IF NOT EXISTS party_emails_party ON party_emails (party_id);
+        CREATE INDEX IF NOT EXISTS party_emails_address_nocase ON party_emails (address COLLATE NOCASE);
+        CREATE TABLE IF NOT EXISTS party_phones (party_id INTEGER, number TEXT);
+        CREATE INDEX IF NOT EXISTS party_phones_party ON party_phones (party_id);
+        CREATE INDEX IF NOT EXISTS party_phones_number_nocase ON party_phones (number COLLATE NOCASE);
+        CREATE TABLE IF NOT EXISTS party_addresses (
+            party_id INTEGER, city TEXT, state TEXT, country TEXT, zip TEXT);
+        CREATE INDEX IF NOT EXISTS party_addresses_party ON party_addresses (party_id);
+        CREATE INDEX IF NOT EXISTS party_addresses_city_nocase ON party_addresses (city COLLATE NOCASE);
+        CREATE INDEX IF NOT EXISTS party_addresses_state_nocase ON party_addresses (state COLLATE NOCASE);
+        CREATE INDEX IF NOT EXISTS party_addresses_country_nocase ON party_addresses (country COLLATE NOCASE);
+        CREATE INDEX IF NOT EXISTS party_addresses_zip_nocase ON party_addresses (zip COLLATE NOCASE);
+        CREATE TABLE IF NOT EXISTS party_tags (party_id INTEGER, tag_id INTEGER);
+        CREATE INDEX IF NOT EXISTS party_tags_party ON party_tags (party_id);
+        CREATE INDEX IF NOT EXISTS party_tags_tag ON party_tags (tag_id);
+        CREATE TABLE IF NOT EXISTS deals (
+            id INTEGER PRIMARY KEY, party_id INTEGER, status TEXT, category_id INTEGER,
+            updated_at TEXT, data BLOB);
+        CREATE INDEX IF NOT EXISTS deals_party ON deals (party_id);
+        CREATE INDEX IF NOT EXISTS deals_status ON deals (status);
+        CREATE TABLE IF NOT EXISTS tasks (
+            id INTEGER PRIMARY KEY, subject_type TEXT, subject_id INTEGER, due_at TEXT,
+            updated_at TEXT, data BLOB);
+        CREATE INDEX IF NOT EXISTS tasks_subject ON tasks (subject_type, subject_id);
+        CREATE TABLE IF NOT EXISTS records (
+            type TEXT, id INTEGER, updated_at TEXT, data BLOB, PRIMARY KEY (type, id));
+        CREATE TABLE IF NOT EXISTS synced (model TEXT PRIMARY KEY, synced_at REAL);
+        CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+
+        -- replaced by the NOCASE indexes, which searches can use
+        DROP INDEX IF EXISTS parties_name;
+        DROP INDEX IF EXISTS parties_person_name;
+        DROP INDEX IF EXISTS party_emails_address;
+        DROP INDEX IF EXISTS party_phones_number;
+        DROP INDEX IF EXISTS party_addresses_city;
+        DROP INDEX IF EXISTS party_addresses_state;
+        DROP INDEX IF EXISTS party_addresses_zip;
+    '''
+
+    # search criteria and the column each one matches against
+    _criteria = {
+        'name': 'parties.name',
+        'first_name': 'parties.first_name',
+        'last_name': 'parties.last_name',
+        'email': 'party_emails.address',
+        'phone': 'party_phones.number',
+        'city': 'party_addresses.city',
+        'state': 'party_addresses.state',
+        'country': 'party_addresses.country',
+        'zip': 'party_addresses.zip',
+    }
+
+    # Task.filter keywords and the subject_type Highrise gives the task
+    _task_subjects = {
+        'person': 'Party',
+        'company': 'Party',
+        'kase': 'Kase',
+        'deal': 'Deal',
+    }
+
+    # the version of the format records are stored in, kept in the meta table
+    schema_version = 1
+
+    def __init__(self, path=':memory:', max_age=300):
+        self.path = path
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(self._schema)
+        self._check_version()
+
+    def _check_version(self):
+        """Stamp a new mirror with the schema version, or refuse to open
+        one that stores its records in a different format"""
+
+        with self._db:
+            row = self._db.execute("SELECT value FROM meta WHERE key = 'schema_version'").fetchone()
+            empty = not any(self._db.execute('SELECT 1 FROM {} LIMIT 1'.format(table)).fetchone()
+                            for table in ('parties', 'deals', 'tasks', 'records'))
+            if row is None and empty:
+                self._db.execute("INSERT INTO meta VALUES ('schema_version', ?)", (text_type(self.schema_version),))
+                return
+        if row is None or row[0] != text_type(self.schema_version):
+            self._db.close()
+            raise ValueError('{} was written by a different version of pyrise; delete it and sync again'.format(
+                self.path))
+
+    def close(self):
+        self._db.close()
+
+    # SyncEngine store interface
+
+    def upsert(self, obj):
+        """Add an object to the mirror, replacing any older copy"""
+
+        data = sqlite3.Binary(_xml_bytes(_record_xml(obj)))
+        updated_at = self._timestamp(getattr(obj, 'updated_at', None))
+
+        with self._lock, self._db:
+            if isinstance(obj, Party):
+                self._upsert_party(obj, updated_at, data)
+            elif isinstance(obj, Deal):
+                self._db.execute(
+                    'INSERT OR REPLACE INTO deals VALUES (?, ?, ?, ?, ?, ?)',
+                    (obj.id, obj.party_id, obj.status, obj.category_id, updated_at, data))
+            elif isinstance(obj, Task):
+                self._db.execute(
+                    'INSERT OR REPLACE INTO tasks VALUES (?, ?, ?, ?, ?, ?)',
+                    (obj.id, obj.subject_type, obj.subject_id, self._timestamp(obj.due_at), updated_at, data))
+            else:
+                self._db.execute(
+                    'INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?)',
+                    (type(obj).__name__, obj.id, updated_at, data))
+
+    def synced(self, model, mark=None):
+        """Record that a model was just brought up to date"""
+
+        with self._lock, self._db:
+            self._db.execute('INSERT OR REPLACE INTO synced VALUES (?, ?)', (model.__name__, time.time()))
+
+        # refresh the query planner's statistics if they're out of date
+        with self._lock:
+            self._db.execute('PRAGMA optimize')
+
+    def sync_tags(self, concurrency=4):
+        """Download which people and companies carry each tag, so that
+        filter(tag_id=...) can be answered from the mirror too"""
+
+        jobs = [(model, tag.id) for tag in Tag.all() for model in (Person, Company)]
+
+        def fetch(job):
+            model, tag_id = job
+            path = '/{}.xml?tag_id={}'.format(model.plural, tag_id)
+            return [(obj.id, tag_id) for obj in QuerySet(model, path, model.singular).iterator()]
+
+        rows = []
+        for result, exc in _map_concurrent(fetch, jobs, concurrency):
+            if exc is not None:
+                raise exc
+            rows.extend(result)
+
+        with self._lock, self._db:
+            self._db.execute('DELETE FROM party_tags')
+            self._db.executemany('INSERT INTO party_tags VALUES (?, ?)', rows)
+            self._db.execute('INSERT OR REPLACE INTO synced VALUES (?, ?)', ('Tag', time.time()))
+
+    # queries
+
+    def is_fresh(self, *models):
+        """Return True if every one of the models was synced less than
+        max_age seconds ago"""
+
+        names = [model if isinstance(model, string_types) else model.__name__ for model in models]
+        with self._lock:
+            rows = dict(self._db.execute(
+                'SELECT model, synced_at FROM synced WHERE model IN ({})'.format(', '.join('?' * len(names))),
+                names).fetchall())
+        oldest = time.time() - self.max_age
+        return all(rows.get(name, 0) > oldest for name in names)
+
+    def filter(self, model, **kwargs):
+        """Answer a filter() query for model, returning a MirrorQuerySet
+        of parties or a list of tasks, or None if the mirror is stale or
+        the query isn't supported"""
+
+        if issubclass(model, Party):
+            return self._filter_parties(model, **kwargs)
+        if issubclass(model, Task):
+            return self._filter_tasks(**kwargs)
+        return None
+
+    def select(self, table, where='1', params=()):
+        """Return the objects stored in table (parties, deals or tasks)
+        that match an SQL condition, for queries filter() can't express"""
+
+        return self._load('SELECT data FROM {} WHERE {} ORDER BY id'.format(table, where), params)
+
+    def _load(self, sql, params=()):
+        """Run a query whose first column is record XML, and return the
+        objects it describes"""
+
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+        objects = []
+        for row in rows:
+            xml = ElementTree.fromstring(bytes(row[0]))
+            objects.append(_class_for_element(xml).from_xml(xml))
+        return objects
+
+    def _filter_parties(self, model, **kwargs):
+        """Build and run the SQL for Party.filter()"""
+
+        models = (Person, Company) if model is Party else (model,)
+        paging = {}
+        if 'n' in kwargs:
+            paging = {'offset': int(kwargs.pop('n')), 'limit': QuerySet.page_size}
+        joins = []
+        where = []
+        params = []
+
+        if model is not Party:
+            where.append('parties.type = ?')
+            params.append(model.__name__)
+
+        if 'since' in kwargs:
+            # this is how SyncEngine updates the mirror, so always ask Highrise
+            return None
+
+        elif 'term' in kwargs:
+            term = re.sub(r'([\\%_])', r'\\\1', text_type(kwargs.pop('term'))) + '%'
+            # one branch per index, since SQLite won't use them for an OR
+            # of LIKEs without statistics
+            where.append(
+                "parties.id IN ("
+                "SELECT id FROM parties WHERE name LIKE ? ESCAPE '\\' UNION "
+                "SELECT id FROM parties WHERE first_name LIKE ? ESCAPE '\\' UNION "
+                "SELECT id FROM parties WHERE last_name LIKE ? ESCAPE '\\' UNION "
+                "SELECT party_id FROM party_emails WHERE address LIKE ? ESCAPE '\\')")
+            params.extend([term] * 4)
+
+        elif 'tag_id' in kwargs:
+            models += ('Tag',)
+            where.append('parties.id IN (SELECT party_id FROM party_tags WHERE tag_id = ?)')
+            params.append(int(kwargs.pop('tag_id')))
+
+        elif 'company_id' in kwargs:
+            where.append('parties.company_id = ?')
+            params.append(int(kwargs.pop('company_id')))
+
+        elif 'title' in kwargs:
+            where.append('parties.title = ?')
+            params.append(kwargs.pop('title'))
+
+        for key, value in list(kwargs.items()):
+            column = self._criteria.get(key)
+            if column is None:
+                return None
+            table = column.split('.')[0]
+            if table != 'parties' and table not in joins:
+                joins.append(table)
+            where.append('{} = ? COLLATE NOCASE'.format(column))
+            params.append(text_type(value))
+
+        if not self.is_fresh(*models):
+            return None
+
+        sql = 'SELECT DISTINCT parties.data, parties.id FROM parties'
+        for table in joins:
+            sql += ' JOIN {0} ON {0}.party_id = parties.id'.format(table)
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += ' ORDER BY parties.id'
+        return MirrorQuerySet(self, model, sql, params, **paging)
+
+    def _filter_tasks(self, **kwargs):
+        """Look up the tasks of a subject for Task.filter()"""
+
+        for key, value in kwargs.items():
+            if key in self._task_subjects:
+                break
+        else:
+            return None
+
+        if not self.is_fresh(Task):
+            return None
+        return self.select('tasks', 'subject_type = ? AND subject_id = ?', (self._task_subjects[key], int(value)))
+
+    def _upsert_party(self, party, updated_at, data):
+        """Write a person or company and its contact details"""
+
+        # people are stored under their full name, so terms can match it
+        first_name = getattr(party, 'first_name', None)
+        last_name = getattr(party, 'last_name', None)
+        name = getattr(party, 'name', None) or ' '.join(part for part in (first_name, last_name) if part) or None
+
+        self._db.execute(
+            'INSERT OR REPLACE INTO parties VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (party.id, type(party).__name__, name, first_name, last_name,
+             getattr(party, 'title', None), getattr(party, 'company_id', None), updated_at, data))
+
+        for table in ('party_emails', 'party_phones', 'party_addresses'):
+            self._db.execute('DELETE FROM {} WHERE party_id = ?'.format(table), (party.id,))
+
+        contact_data = party.contact_data
+        if contact_data is None:
+            return
+        self._db.executemany('INSERT INTO party_emails VALUES (?, ?)', [
+            (party.id, email.address) for email in contact_data.email_addresses or []])
+        self._db.executemany('INSERT INTO party_phones VALUES (?, ?)', [
+            (party.id, phone.number) for phone in contact_data.phone_numbers or []])
+        self._db.executemany('INSERT INTO party_addresses VALUES (?, ?, ?, ?, ?)', [
+            (party.id, address.city, address.state, address.country, address.zip)
+            for address in contact_data.addresses or []])
+
+    @staticmethod
+    def _timestamp(value):
+        """Store datetimes as sortable text, whatever the datetime mode"""
+
+        value = _as_datetime(value)
+        if value is None:
+            return None
+        return datetime.strftime(value, '%Y-%m-%d %H:%M:%S')
+
+
 class ElevatorError(Exception):
     pass
 
@@ -1241,3 +4379,12 @@ class UnexpectedResponse(ElevatorError):
 
 class InsufficientStorage(ElevatorError):
     pass
+
+
+class ServiceUnavailable(UnexpectedResponse):
+    """Highrise is down or throttling requests. retry_after is the
+    number of seconds the server asked us to wait, if it said."""
+
+    def __init__(self, message=None, retry_after=None):
+        super(ServiceUnavailable, self).__init__(message)
+        self.retry_after = retry_after
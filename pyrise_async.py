@@ -0,0 +1,314 @@
+"""asyncio support for pyrise.
+
+You shouldn't normally need to import this module directly. The model
+classes in pyrise expose coroutine versions of their methods (aget,
+aall, afilter, asave, adelete, ...) which call into it, and
+Highrise.arequest is the async counterpart of Highrise.request.
+
+Requires aiohttp (pip install pyrise[async]) and Python 3.5+."""
+
+import asyncio
+import functools
+import time
+import weakref
+from xml.etree import ElementTree
+
+try:
+    import aiohttp
+except ImportError:
+    raise ImportError('asyncio support in pyrise requires aiohttp: pip install pyrise[async]')
+
+from pyrise import (CallRecord, ElevatorError, Highrise, MirrorQuerySet, QuerySet, RequestsTransport,
+                    UnexpectedResponse, _emit, _received_bytes)
+
+
+# one aiohttp session (and connection pool) per event loop and client
+_sessions = weakref.WeakKeyDictionary()
+
+
+class Response(object):
+    """The parts of an aiohttp response pyrise needs, once the body has
+    been read, in the same shape as a requests response"""
+
+    def __init__(self, status_code, headers, content):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8', 'replace')
+
+
+def session(client=None):
+    """Return the aiohttp session for the running event loop and client
+    (the current one by default), creating it with the same pool
+    settings as the blocking client if needed"""
+
+    client = client or Highrise.client()
+    sessions = _sessions.setdefault(asyncio.get_event_loop(), {})
+    aiohttp_session = sessions.get(client)
+    if aiohttp_session is None or aiohttp_session.closed:
+        settings = client._pool_settings
+        connector = aiohttp.TCPConnector(
+            limit=settings['pool_size'] * settings['max_per_host'],
+            limit_per_host=settings['max_per_host'],
+            force_close=not settings['keep_alive'],
+        )
+        aiohttp_session = aiohttp.ClientSession(connector=connector)
+        sessions[client] = aiohttp_session
+    return aiohttp_session
+
+
+async def close():
+    """Close the aiohttp sessions for the running event loop"""
+
+    sessions = _sessions.pop(asyncio.get_event_loop(), {})
+    for aiohttp_session in sessions.values():
+        await aiohttp_session.close()
+
+
+# The functions below are called by the models' coroutine methods. They
+# pick the client to use straight away, while the caller's client is
+# active, and return a coroutine that uses it.
+
+def request(path, method='GET', xml=None, hooks=None, **request_kwargs):
+    """Process an arbitrary request to Highrise without blocking.
+    Behaves exactly like Highrise.request."""
+
+    return client_request(Highrise.client(), path, method, xml, hooks, **request_kwargs)
+
+
+async def client_request(client, path, method='GET', xml=None, hooks=None, **request_kwargs):
+    """Like request(), through the given Client"""
+
+    if not Highrise._sinks:
+        return await _request(client, None, path, method, xml, hooks, **request_kwargs)
+
+    # time the request for the sinks
+    record = CallRecord(method, path)
+    start = time.monotonic()
+    try:
+        return await _request(client, record, path, method, xml, hooks, **request_kwargs)
+    except Exception as e:
+        record.error = e
+        raise
+    finally:
+        record.wait_time = max(time.monotonic() - start - record.network_time - record.parse_time, 0.0)
+        _emit(record)
+
+
+async def _request(client, record, path, method, xml, hooks, **request_kwargs):
+    """Make a request for client_request(), filling in record if it isn't None"""
+
+    # build the base request URL
+    url = '{}/{}'.format(client._server, path.strip('/'))
+
+    # make the request, asking for a compressed response
+    kwargs = {'auth': aiohttp.BasicAuth(client.token, 'X')}
+    kwargs.update(request_kwargs)
+    kwargs['headers'] = headers = {'Accept-Encoding': 'gzip, deflate'}
+
+    if xml:
+        if isinstance(xml, str):
+            xml = xml.encode('utf-8')
+        kwargs['data'] = xml
+        headers['Content-Type'] = 'application/xml; charset=utf-8'
+    headers.update(request_kwargs.get('headers') or {})
+
+    # ask Highrise to only send the body if it changed since we cached it
+    cache = client._validator_cache
+    cached = None
+    if cache is not None:
+        cache_key = (client.token, url)
+        if method == 'GET':
+            cached = cache.get(cache_key)
+        if cached is not None:
+            headers = dict(kwargs.get('headers') or {})
+            headers.update(cache.conditional_headers(cached))
+            kwargs['headers'] = headers
+
+    # other transports block, so they are run off the event loop
+    transport = client._transport
+    if type(transport) is not RequestsTransport:
+        kwargs['auth'] = (client.token, 'X')
+
+    async def send():
+        start = time.monotonic()
+        if type(transport) is not RequestsTransport:
+            call = functools.partial(transport.request, method, url, **kwargs)
+            r = await asyncio.get_event_loop().run_in_executor(None, call)
+            response = Response(r.status_code, r.headers, r.content)
+            received = _received_bytes(r)
+        else:
+            async with session(client).request(method, url, **kwargs) as r:
+                response = Response(r.status, r.headers, await r.read())
+                # aiohttp only counts the body after decompressing it
+                received = int(r.headers.get('Content-Length') or 0) or len(response.content)
+        if record is not None:
+            record.network_time += time.monotonic() - start
+            record.status = response.status_code
+            record.request_bytes = len(xml or b'')
+            record.response_bytes = received
+
+        # raise appropriate exceptions if there is an error
+        Highrise._raise_for_status(response)
+        return response
+
+    response = await _send(client, method, send)
+
+    if hooks and 'response' in hooks:
+        hooks['response'](response)
+
+    # if this was a PUT or DELETE request, return status (hopefully success)
+    if method in ('PUT', 'DELETE'):
+        if cache is not None:
+            cache.invalidate(cache_key)
+        return response.status_code
+
+    # if nothing changed, reuse what we parsed last time
+    if cached is not None and response.status_code == 304:
+        return cache.not_modified(cached)
+
+    # for GET and POST requests, return the XML response
+    start = time.monotonic()
+    try:
+        parsed = ElementTree.fromstring(response.content)
+    except ElementTree.ParseError:
+        raise UnexpectedResponse("The server sent back something that wasn't valid XML.")
+    if record is not None:
+        record.parse_time = time.monotonic() - start
+
+    if cache is not None and method == 'GET':
+        cache.store(cache_key, response.headers, parsed)
+    return parsed
+
+
+async def _send(client, method, send):
+    """Await send() to make a request, through the client's scheduler if
+    one is set, sleeping on the event loop rather than blocking it"""
+
+    scheduler = client._scheduler
+    if scheduler is None:
+        return await send()
+
+    attempt = 0
+    while True:
+        start = time.monotonic()
+        scheduler._enqueue()
+        try:
+            delay = scheduler._reserve()
+            while delay:
+                await asyncio.sleep(delay)
+                delay = scheduler._reserve()
+        finally:
+            scheduler._dequeue(time.monotonic() - start)
+
+        try:
+            return await send()
+        except ElevatorError as e:
+            delay = scheduler.retry_delay(method, e, attempt)
+            if delay is None:
+                raise
+            attempt += 1
+            await asyncio.sleep(delay)
+
+
+def get(model, id):
+    """Get a single object of the given model"""
+
+    return _get(Highrise.client(), model, id)
+
+
+async def _get(client, model, id):
+    xml = await client_request(client, '/{}/{}.xml'.format(model.plural, id))
+    with client:
+        for obj_xml in xml.iter(tag=model.singular):
+            return model.from_xml(obj_xml)
+
+
+def list_objects(model, path, tag):
+    """Get a list of objects of the given model from a single request"""
+
+    return _list_objects(Highrise.client(), model, path, tag)
+
+
+async def _list_objects(client, model, path, tag):
+    xml = await client_request(client, path)
+    with client:
+        return [model.from_xml(item) for item in xml.iter(tag)]
+
+
+def fetch(queryset):
+    """Evaluate a QuerySet, requesting every page it covers"""
+
+    return _fetch(queryset._client or Highrise.client(), queryset)
+
+
+async def _fetch(client, queryset):
+    # a mirror answers without making any requests
+    if isinstance(queryset, MirrorQuerySet):
+        return list(queryset)
+
+    objects = []
+    while True:
+        n = queryset.offset + len(objects)
+        page = await _list_objects(client, queryset.model, queryset._page_path(n), queryset.tag)
+        objects.extend(page)
+
+        if not queryset.paginate or len(page) < QuerySet.page_size:
+            break
+        if queryset.limit is not None and len(objects) >= queryset.limit:
+            break
+
+    if queryset.limit is not None:
+        del objects[queryset.limit:]
+    return objects
+
+
+def save(obj, refetch='auto', **kwargs):
+    """Save an object to Highrise, like its save() method does"""
+
+    return _save(obj.__dict__.get('_client') or Highrise.client(), obj, refetch, **kwargs)
+
+
+async def _save(client, obj, refetch, **kwargs):
+    xml_string = obj._save_body()
+
+    # if this was an initial save, update the object with the returned data
+    if obj.id is None:
+        response = await client_request(client, '/{}.xml'.format(obj.plural), method='POST', xml=xml_string, **kwargs)
+        with client:
+            obj._created(response)
+        return
+
+    if xml_string is None:
+        return
+    await client_request(client, '/{}/{}.xml'.format(obj.plural, obj.id), method='PUT', xml=xml_string, **kwargs)
+    if obj._saved(refetch):
+        new = await _get(client, type(obj), obj.id)
+        if new is not obj:
+            obj.__dict__ = new.__dict__
+
+
+def delete(obj):
+    """Delete an object from Highrise"""
+
+    client = obj.__dict__.get('_client') or Highrise.client()
+    return client_request(client, '/{}/{}.xml'.format(obj.plural, obj.id), method='DELETE')
+
+
+def add_tag(model, subject, subject_id, name):
+    """Add a tag to a specific person, company, case, or deal"""
+
+    return _add_tag(Highrise.client(), model, subject, subject_id, name)
+
+
+async def _add_tag(client, model, subject, subject_id, name):
+    path = '{}/{}/tags.xml'.format(subject, subject_id)
+    response = await client_request(client, path, method='POST', xml=model._name_xml(name))
+
+    # this may have created a new tag
+    with client:
+        model.invalidate_cached('all')
+        return model.from_xml(response)
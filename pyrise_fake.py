@@ -0,0 +1,495 @@
+"""An in-process fake of the Highrise API.
+
+FakeHighrise is a Transport that keeps people, companies, deals, cases,
+tasks, notes, emails and tags in memory and answers the same requests the
+models make, so code built on pyrise can be tested, or load tested at
+realistic scale, without a network or a Highrise account:
+
+    >>> from pyrise import Highrise, Person
+    >>> from pyrise_fake import FakeHighrise
+    >>> fake = FakeHighrise(latency=0.05)
+    >>> Highrise.set_transport(fake)
+    >>> Person(first_name='Ada', last_name='Lovelace').save()
+    >>> Person.filter(term='ada')[0].last_name
+    'Lovelace'
+
+It can add latency to every request and fail requests on purpose, to
+see how code copes when Highrise is slow or unavailable."""
+
+import io
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from xml.etree import ElementTree
+
+from six import text_type
+from six.moves.urllib.parse import parse_qsl
+
+from pyrise import Case, Company, Deal, Email, Note, Person, Task, Transport
+
+# the models stored in each collection
+_MODELS = OrderedDict([
+    ('people', Person),
+    ('companies', Company),
+    ('deals', Deal),
+    ('kases', Case),
+    ('tasks', Task),
+    ('notes', Note),
+    ('emails', Email),
+])
+
+# what notes, emails and tasks call the type of the subject they belong to
+_SUBJECT_TYPES = {'people': 'Party', 'companies': 'Party', 'deals': 'Deal', 'kases': 'Kase'}
+
+# the path and query of a request URL, whatever the server
+_URL = re.compile(r'^(?:[a-z]+://[^/]*|[^/]*)(/[^?]*)\??(.*)$')
+
+# what search criteria match in contact data
+_CRITERIA = {
+    'email': ('email-addresses', 'address'),
+    'phone': ('phone-numbers', 'number'),
+    'city': ('addresses', 'city'),
+    'state': ('addresses', 'state'),
+    'zip': ('addresses', 'zip'),
+    'country': ('addresses', 'country'),
+}
+
+
+class FakeResponse(object):
+    """A response from FakeHighrise, in the same shape as a requests response"""
+
+    def __init__(self, status_code, content=b'', headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+        self.raw = io.BytesIO(content)
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8')
+
+    def close(self):
+        # there is no connection to release
+        pass
+
+
+class FakeHighrise(Transport):
+    """An in-memory Highrise account that answers requests in-process.
+
+    latency is a delay in seconds added to every request. error_rate is
+    the fraction of requests, picked at random (with seed, if given),
+    that fail with error_status instead, and fail() makes particular
+    requests fail. If token is given, requests made with any other token
+    fail with 401. requests lists the (method, path) of every request
+    made, including the ones that failed."""
+
+    page_size = 500
+
+    # each path the models request, and the method that answers it
+    _routes = [(re.compile(pattern), name) for pattern, name in (
+        (r'^/(people|companies|deals|kases|tasks|notes|emails)\.xml$', '_collection'),
+        (r'^/kases/(open|closed)\.xml$', '_cases'),
+        (r'^/(people|companies)/search\.xml$', '_search'),
+        (r'^/companies/(\d+)/people\.xml$', '_company_people'),
+        (r'^/(people|companies|deals|kases|tasks|notes|emails)/(\d+)\.xml$', '_record'),
+        (r'^/(people|companies|deals|kases)/(\d+)/(notes|emails|tasks)\.xml$', '_attached'),
+        (r'^/deals/(\d+)/status\.xml$', '_deal_status'),
+        (r'^/tags\.xml$', '_all_tags'),
+        (r'^/(people|companies|deals|kases)/(\d+)/tags\.xml$', '_subject_tags'),
+        (r'^/(people|companies|deals|kases)/(\d+)/tags/(\d+)\.xml$', '_untag'),
+    )]
+
+    def __init__(self, latency=0.0, error_rate=0.0, error_status=503, token=None, seed=None):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.token = token
+        self.requests = []
+
+        self._lock = threading.RLock()
+        self._random = random.Random(seed)
+        self._failures = []
+        self._next_id = 1
+        self._records = dict((collection, OrderedDict()) for collection in _MODELS)
+        self._tags = OrderedDict()
+        self._taggings = {}
+
+    def add(self, obj, tags=()):
+        """Store a Person, Company, Deal, Case, Task, Note or Email without
+        making a request, tagged with the tag names in tags, and return a
+        copy of it with its new id. Use this to load test data quickly."""
+
+        with self._lock:
+            element = self._create(obj.plural, obj.save_xml())
+            for name in tags:
+                self._tag(obj.plural, int(element.findtext('id')), name)
+            return type(obj).from_xml(element)
+
+    def fail(self, status=503, method=None, path=None, times=1, retry_after=None):
+        """Make the next times requests fail with status, or only the ones
+        with the given method and whose path matches the regular
+        expression path. retry_after is sent as the Retry-After header."""
+
+        with self._lock:
+            self._failures.append({
+                'status': status,
+                'method': method,
+                'path': re.compile(path) if path is not None else None,
+                'times': times,
+                'retry_after': retry_after,
+            })
+
+    def request(self, method, url, **kwargs):
+        path, query = _URL.match(url).groups()
+        with self._lock:
+            self.requests.append((method, path))
+            failure = self._failure(method, path)
+
+        if self.latency:
+            time.sleep(self.latency)
+        if failure is not None:
+            return failure
+        if self.token is not None and (kwargs.get('auth') or (None,))[0] != self.token:
+            return FakeResponse(401, b'HTTP Basic: Access denied.')
+
+        body = kwargs.get('data')
+        if body:
+            try:
+                body = ElementTree.fromstring(body)
+            except ElementTree.ParseError:
+                return FakeResponse(400)
+
+        with self._lock:
+            for pattern, name in self._routes:
+                match = pattern.match(path)
+                if match:
+                    status, element = getattr(self, name)(method, dict(parse_qsl(query)), body, *match.groups())
+                    break
+            else:
+                status, element = 404, None
+
+            if element is None:
+                return FakeResponse(status)
+            return FakeResponse(status, ElementTree.tostring(element, encoding='UTF-8'))
+
+    def _failure(self, method, path):
+        """Return the failed response for a request that should fail, or None"""
+
+        for failure in self._failures:
+            if failure['method'] not in (None, method):
+                continue
+            if failure['path'] is not None and not failure['path'].search(path):
+                continue
+
+            failure['times'] -= 1
+            if failure['times'] <= 0:
+                self._failures.remove(failure)
+            headers = {}
+            if failure['retry_after'] is not None:
+                headers['Retry-After'] = text_type(failure['retry_after'])
+            return FakeResponse(failure['status'], headers=headers)
+
+        if self.error_rate and self._random.random() < self.error_rate:
+            return FakeResponse(self.error_status)
+        return None
+
+    def _collection(self, method, params, body, collection):
+        """/people.xml, /deals.xml, ...: list records or create one"""
+
+        if method == 'POST' and body is not None:
+            return 201, self._create(collection, body)
+        if method != 'GET':
+            return 404, None
+
+        records = list(self._records[collection].values())
+        if collection == 'deals':
+            return 200, self._page(collection, records, params)
+        if collection not in ('people', 'companies'):
+            return 200, _array(collection, records)
+
+        if 'tag_id' in params:
+            tag_id = int(params['tag_id'])
+            records = [r for r in records if tag_id in self._taggings.get((collection, _id(r)), ())]
+        if 'title' in params:
+            records = [r for r in records if r.findtext('title') == params['title']]
+        if 'since' in params:
+            since = datetime.strptime(params['since'], '%Y%m%d%H%M%S').strftime('%Y-%m-%dT%H:%M:%SZ')
+            return 200, _array(collection, [r for r in records if r.findtext('updated-at') >= since])
+        return 200, self._page(collection, records, params)
+
+    def _cases(self, method, params, body, status):
+        """/kases/open.xml, /kases/closed.xml: list open or closed cases"""
+
+        records = [r for r in self._records['kases'].values() if bool(r.findtext('closed-at')) == (status == 'closed')]
+        return 200, self._page('kases', records, params)
+
+    def _search(self, method, params, body, collection):
+        """/people/search.xml: find parties by term or criteria"""
+
+        records = list(self._records[collection].values())
+        term = params.pop('term', None)
+        if term is not None:
+            term = term.lower()
+            records = [r for r in records if any(value.lower().startswith(term) for value in _names(r))]
+
+        for key, value in params.items():
+            match = re.match(r'^criteria\[(.+)\]$', key)
+            if match:
+                records = [r for r in records if _matches(r, match.group(1), value)]
+        return 200, self._page(collection, records, params)
+
+    def _company_people(self, method, params, body, company_id):
+        """/companies/#{id}/people.xml: the people at a company"""
+
+        people = self._records['people'].values()
+        return 200, _array('people', [r for r in people if r.findtext('company-id') == company_id])
+
+    def _record(self, method, params, body, collection, id):
+        """/people/#{id}.xml, ...: get, update or delete a record"""
+
+        id = int(id)
+        record = self._records[collection].get(id)
+        if record is None:
+            return 404, None
+
+        if method == 'GET':
+            return 200, record
+        if method == 'PUT' and body is not None:
+            _update(record, body)
+            self._stored(collection, record)
+            return 200, None
+        if method == 'DELETE':
+            del self._records[collection][id]
+            self._taggings.pop((collection, id), None)
+            return 200, None
+        return 404, None
+
+    def _attached(self, method, params, body, subject, subject_id, collection):
+        """/people/#{id}/notes.xml, ...: the notes, emails or tasks of a subject"""
+
+        subject_type = _SUBJECT_TYPES[subject]
+        records = [
+            r for r in self._records[collection].values()
+            if r.findtext('subject-id') == subject_id and r.findtext('subject-type') == subject_type
+        ]
+        return 200, _array(collection, records)
+
+    def _deal_status(self, method, params, body, id):
+        """/deals/#{id}/status.xml: change the status of a deal"""
+
+        record = self._records['deals'].get(int(id))
+        if record is None or method != 'PUT' or body is None:
+            return 404, None
+
+        changes = ElementTree.Element('deal')
+        _element(changes, 'status', body.findtext('name'))
+        _element(changes, 'status-changed-on', datetime.utcnow().strftime('%Y-%m-%d'))
+        _update(record, changes)
+        self._stored('deals', record)
+        return 200, None
+
+    def _all_tags(self, method, params, body):
+        """/tags.xml: every tag"""
+
+        return 200, _array('tags', [_tag_element(id, name) for id, name in self._tags.items()])
+
+    def _subject_tags(self, method, params, body, subject, subject_id):
+        """/people/#{id}/tags.xml: list the tags on a subject, or add one"""
+
+        key = (subject, int(subject_id))
+        if method == 'POST' and body is not None:
+            if subject in self._records and key[1] not in self._records[subject]:
+                return 404, None
+            id = self._tag(subject, key[1], body.text)
+            return 201, _tag_element(id, self._tags[id])
+
+        tags = [_tag_element(id, self._tags[id]) for id in self._taggings.get(key, ())]
+        return 200, _array('tags', tags)
+
+    def _untag(self, method, params, body, subject, subject_id, tag_id):
+        """/people/#{id}/tags/#{tag_id}.xml: remove a tag from a subject"""
+
+        tag_ids = self._taggings.get((subject, int(subject_id)), [])
+        if method != 'DELETE' or int(tag_id) not in tag_ids:
+            return 404, None
+        tag_ids.remove(int(tag_id))
+        return 200, None
+
+    def _create(self, collection, element):
+        """Store a new record from the XML that was sent for it"""
+
+        # Highrise calls cases kases, whatever they were sent as
+        element.tag = _MODELS[collection].singular
+        for child in element.findall('id'):
+            element.remove(child)
+        id = self._new_id()
+        element.insert(0, _element(None, 'id', text_type(id)))
+        if element.find('created-at') is None:
+            _element(element, 'created-at', _now())
+
+        self._records[collection][id] = element
+        self._stored(collection, element)
+        return element
+
+    def _stored(self, collection, element):
+        """Finish off a record that was just created or updated: stamp it,
+        give new contact details ids and set the types Highrise sends"""
+
+        updated = element.find('updated-at')
+        if updated is None:
+            updated = _element(element, 'updated-at')
+        updated.text = _now()
+
+        for container in _containers(element):
+            for item in container:
+                if item.find('id') is None:
+                    item.insert(0, _element(None, 'id', text_type(self._new_id())))
+
+        fields = _MODELS[collection].fields
+        for child in element:
+            field = fields.get(child.tag.replace('-', '_'))
+            if child.tag in ('created-at', 'updated-at') or (field is not None and field.type is datetime):
+                child.set('type', 'datetime')
+            elif field is not None and field.type in (int, 'id'):
+                child.set('type', 'integer')
+        for child in element.iter('id'):
+            child.set('type', 'integer')
+        _indent(element)
+
+    def _tag(self, subject, subject_id, name):
+        """Tag a subject with name, creating the tag if needed, and return its id"""
+
+        for id, tag_name in self._tags.items():
+            if tag_name == name:
+                break
+        else:
+            id = self._new_id()
+            self._tags[id] = name
+
+        tag_ids = self._taggings.setdefault((subject, subject_id), [])
+        if id not in tag_ids:
+            tag_ids.append(id)
+        return id
+
+    def _page(self, collection, records, params):
+        """Return the page of records starting at the n parameter"""
+
+        n = int(params.get('n') or 0)
+        return _array(collection, records[n:n + self.page_size])
+
+    def _new_id(self):
+        id = self._next_id
+        self._next_id += 1
+        return id
+
+
+def _now():
+    return datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def _id(record):
+    return int(record.findtext('id'))
+
+
+def _element(parent, tag, text=None):
+    """Create an element, adding it to parent if that isn't None"""
+
+    element = ElementTree.Element(tag) if parent is None else ElementTree.SubElement(parent, tag)
+    element.text = text
+    return element
+
+
+def _array(collection, records):
+    """Return an array element listing records, as Highrise sends lists"""
+
+    element = ElementTree.Element(collection, type='array')
+    element.text = '\n'
+    element.extend(records)
+    return element
+
+
+def _tag_element(id, name):
+    element = ElementTree.Element('tag')
+    _element(element, 'id', text_type(id)).set('type', 'integer')
+    _element(element, 'name', name)
+    _indent(element)
+    return element
+
+
+def _containers(element):
+    """Yield the elements in a record that hold lists of child objects,
+    like contact data's email-addresses and a person's subject_datas"""
+
+    for child in element:
+        if child.get('type') == 'array':
+            yield child
+        elif child.tag == 'contact-data':
+            for container in child:
+                yield container
+
+
+def _update(record, changes, containers=None):
+    """Apply the XML sent for an update to a stored record.
+
+    Fields that were sent replace the stored ones, and list items are
+    matched up by id, with items that have no id being added."""
+
+    if containers is None:
+        containers = set(id(container) for container in _containers(record))
+    for change in changes:
+        if change.tag == 'id':
+            continue
+        current = record.find(change.tag)
+        if current is None:
+            record.append(change)
+        elif id(current) in containers:
+            items = dict((item.findtext('id'), item) for item in current)
+            for item in change:
+                existing = items.get(item.findtext('id'))
+                if existing is None:
+                    current.append(item)
+                else:
+                    _update(existing, item, ())
+        elif change.tag == 'contact-data':
+            _update(current, change, set(id(container) for container in current))
+        elif len(change):
+            _update(current, change, ())
+        else:
+            current.text = change.text
+
+
+def _names(record):
+    """Return the names and email addresses a search term can match the
+    start of"""
+
+    first_name, last_name = record.findtext('first-name'), record.findtext('last-name')
+    values = [first_name, last_name, record.findtext('name'), ' '.join(name for name in (first_name, last_name) if name)]
+    values.extend(e.text for e in record.iterfind('contact-data/email-addresses/email-address/address'))
+    return [value for value in values if value]
+
+
+def _matches(record, key, value):
+    """Return whether a record matches one search criterion"""
+
+    value = value.lower()
+    if key in _CRITERIA:
+        container, tag = _CRITERIA[key]
+        path = 'contact-data/{}/*/{}'.format(container, tag)
+        return any((e.text or '').lower() == value for e in record.iterfind(path))
+    return (record.findtext(key.replace('_', '-')) or '').lower() == value
+
+
+def _indent(element, level=0):
+    """Lay out an element the way Highrise does, so that elements with
+    children also have text (which from_xml relies on)"""
+
+    children = len(element)
+    if children:
+        padding = '\n' + '  ' * (level + 1)
+        element.text = padding
+        for i, child in enumerate(element):
+            _indent(child, level + 1)
+            child.tail = padding if i < children - 1 else '\n' + '  ' * level
@@ -11,8 +11,9 @@ setup(name="pyrise",
       author="Jason Ford",
       author_email="jason@feedmagnet.com",
       url="http://github.com/feedmagnet/pyrise",
-      py_modules=['pyrise'],
+      py_modules=['pyrise', 'pyrise_async', 'pyrise_fake'],
       install_requires = ['httplib2', 'requests', 'six'],
+      extras_require = {'async': ['aiohttp']},
       keywords= "python 37signals highrise api wrapper feedmagnet",
       classifiers=[
          "Development Status :: 5 - Production/Stable",
@@ -0,0 +1,21 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from pyrise import Client
+from pyrise_fake import FakeHighrise
+
+
+@pytest.fixture
+def fake():
+    """A FakeHighrise that requests go to for the length of the test,
+    through a client of its own so no state leaks between tests"""
+
+    fake = FakeHighrise(seed=0)
+    client = Client('token', 'example')
+    client.set_transport(fake)
+    with client:
+        yield fake
@@ -0,0 +1,96 @@
+import itertools
+
+from pyrise import Checkpoint, GatewayFailure, Person
+
+
+def new_people(count):
+    return [Person(first_name='Ada{}'.format(i), last_name='Lovelace') for i in range(count)]
+
+
+def test_every_object_is_saved(fake):
+    people = new_people(20)
+    results = sorted(Person.bulk_save(people, concurrency=4))
+
+    assert [(index, obj, error) for index, obj, error in results] == [(i, people[i], None) for i in range(20)]
+    assert all(person.id is not None for person in people)
+    assert len(Person.all()) == 20
+
+
+def test_a_failed_save_doesnt_stop_the_others(fake):
+    people = new_people(10)
+    fake.fail(422, method='POST', times=2)
+    results = list(Person.bulk_save(people, concurrency=4))
+
+    errors = [error for index, obj, error in results if error is not None]
+    assert len(results) == 10
+    assert len(errors) == 2
+    assert all(isinstance(error, GatewayFailure) for error in errors)
+    assert len(Person.all()) == 8
+
+
+def test_errors_are_reported_with_their_objects(fake):
+    people = new_people(3)
+    fake.fail(422, method='POST', times=1)
+
+    [(index, obj, error)] = [result for result in Person.bulk_save(people, concurrency=1) if result[2] is not None]
+    assert (index, obj) == (0, people[0])
+    assert obj.id is None
+
+
+def test_a_checkpoint_skips_objects_saved_before(fake, tmp_path):
+    path = str(tmp_path / 'progress.txt')
+    people = new_people(6)
+    fake.fail(422, method='POST', path='/people', times=2)
+
+    with Checkpoint(path) as checkpoint:
+        failed = [index for index, obj, error in Person.bulk_save(people, concurrency=1, checkpoint=checkpoint) if error]
+    assert failed == [0, 1]
+    assert checkpoint._file.closed
+
+    with Checkpoint(path) as checkpoint:
+        assert len(checkpoint) == 4
+        assert [index for index, obj, error in Person.bulk_save(people, concurrency=1, checkpoint=checkpoint)] == [0, 1]
+    assert len(Person.all()) == 6
+
+    with Checkpoint(path) as checkpoint:
+        assert list(Person.bulk_save(people, checkpoint=checkpoint)) == []
+
+
+def test_a_checkpoint_path_is_opened_and_closed(fake, tmp_path):
+    path = str(tmp_path / 'progress.txt')
+    people = new_people(4)
+
+    saves = Person.bulk_save(people, concurrency=2, checkpoint=path)
+    next(saves)
+    saves.close()
+    with Checkpoint(path) as checkpoint:
+        saved = len(checkpoint)
+    assert saved >= 1
+
+    assert len(list(Person.bulk_save(people, concurrency=2, checkpoint=path))) == 4 - saved
+    assert list(Person.bulk_save(people, checkpoint=path)) == []
+
+
+def test_checkpoints_use_the_key(fake, tmp_path):
+    path = str(tmp_path / 'progress.txt')
+    with Checkpoint(path) as checkpoint:
+        list(Person.bulk_save(new_people(2), checkpoint=checkpoint, key=lambda person: person.first_name))
+
+    with open(path) as f:
+        assert sorted(f.read().split()) == ['Ada0', 'Ada1']
+
+    results = list(Person.bulk_save(new_people(3), checkpoint=path, key=lambda person: person.first_name))
+    assert [index for index, obj, error in results] == [2]
+
+
+def test_objects_are_read_as_saves_finish(fake):
+    read = []
+
+    def endless():
+        for i in itertools.count():
+            read.append(i)
+            yield Person(first_name='Ada{}'.format(i), last_name='Lovelace')
+
+    saved = list(itertools.islice(Person.bulk_save(endless(), concurrency=4), 10))
+    assert len(saved) == 10
+    assert len(read) <= 10 + 2 * 4
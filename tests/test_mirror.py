@@ -0,0 +1,111 @@
+import pytest
+
+from pyrise import (Address, Company, ContactData, Deal, EmailAddress, Highrise, MirrorQuerySet, Person,
+                    SQLiteMirror, SyncEngine)
+
+
+def query_plan(queryset):
+    """Return the steps of SQLite's plan for a page of a MirrorQuerySet"""
+
+    sql = 'EXPLAIN QUERY PLAN ' + queryset.sql + ' LIMIT ? OFFSET ?'
+    rows = queryset.mirror._db.execute(sql, list(queryset.params) + [500, 0]).fetchall()
+    return [row[-1] for row in rows]
+
+
+def filled_mirror(fake, people=1200):
+    for i in range(people):
+        contact_data = ContactData(
+            email_addresses=[EmailAddress(address='ada{}@example.com'.format(i))],
+            addresses=[Address(city='Austin' if i % 2 else 'Paris')],
+        )
+        fake.add(Person(first_name='Ada{}'.format(i), last_name='Lovelace', contact_data=contact_data))
+    fake.add(Company(name='Acme'))
+
+    mirror = SQLiteMirror()
+    SyncEngine(mirror, {}, models=(Person, Company)).run()
+    Highrise.set_mirror(mirror)
+    return mirror
+
+
+def test_filter_is_answered_locally_as_a_queryset(fake):
+    filled_mirror(fake)
+    requests = len(fake.requests)
+
+    people = Person.filter(term='Ada1')
+    assert isinstance(people, MirrorQuerySet)
+    assert people.first().first_name == 'Ada1'
+    assert people.exists()
+    assert len(people) == 1 + 10 + 100 + 200
+    assert Person.filter(term='ada1 love').exists()
+    assert Person.filter(term='ADA12@').first().first_name == 'Ada12'
+    assert not Person.filter(term='da1').exists()
+    assert len(fake.requests) == requests
+
+
+def test_filter_pages_through_results(fake):
+    filled_mirror(fake)
+
+    austin = Person.filter(city='austin')
+    assert len(austin) == 600
+    assert [person.first_name for person in austin[:3]] == ['Ada1', 'Ada3', 'Ada5']
+    assert austin[599].first_name == 'Ada1199'
+    assert sum(1 for _ in Person.filter(city='Paris').iterator()) == 600
+    assert len(Person.filter(city='Paris', n=500)) == 100
+
+
+def test_term_uses_the_indexes_without_statistics(fake, tmp_path):
+    path = str(tmp_path / 'mirror.db')
+    mirror = filled_mirror(fake, people=1200)
+    mirror._db.execute('VACUUM INTO ?', (path,))
+
+    # a copy that has never been analyzed, as it is before its first sync ends
+    mirror = SQLiteMirror(path)
+    mirror._db.execute('DROP TABLE IF EXISTS sqlite_stat1')
+    mirror._db.commit()
+    mirror = SQLiteMirror(path)
+    Highrise.set_mirror(mirror)
+
+    plan = query_plan(Person.filter(term='ada'))
+    assert not any(step.startswith('SCAN') for step in plan), plan
+    for index in ('parties_name_nocase', 'parties_first_name_nocase', 'parties_last_name_nocase',
+                  'party_emails_address_nocase'):
+        assert any(index in step for step in plan), plan
+
+
+def test_criteria_use_the_indexes(fake):
+    filled_mirror(fake)
+
+    for queryset in (Person.filter(email='ada1@example.com'), Person.filter(term='ada')):
+        plan = query_plan(queryset)
+        assert not any(step.startswith('SCAN') for step in plan), plan
+
+
+def test_records_are_stored_as_xml_and_rebuilt(fake):
+    mirror = filled_mirror(fake, people=3)
+    deal = Deal(name='Rollout', status='pending')
+    fake.add(deal)
+    SyncEngine(mirror, {}, models=(Deal,)).run()
+
+    data = mirror._db.execute('SELECT data FROM parties ORDER BY id').fetchone()[0]
+    assert bytes(data).startswith(b'<party>')
+
+    person = Person.filter(term='ada0').first()
+    original = Person.get(person.id)
+    assert person.contact_data.email_addresses[0].address == 'ada0@example.com'
+    assert person.contact_data.addresses[0].city == 'Paris'
+    assert person.created_at == original.created_at
+    assert person.changed_fields() == []
+
+    [deal] = mirror.select('deals')
+    assert (deal.name, deal.status, deal.updated_at) == ('Rollout', 'pending', Deal.get(deal.id).updated_at)
+
+
+def test_mirror_refuses_files_of_another_schema_version(tmp_path):
+    path = str(tmp_path / 'mirror.db')
+    mirror = SQLiteMirror(path)
+    mirror._db.execute("UPDATE meta SET value = '0' WHERE key = 'schema_version'")
+    mirror._db.commit()
+    mirror.close()
+
+    with pytest.raises(ValueError):
+        SQLiteMirror(path)
@@ -0,0 +1,87 @@
+import pytest
+
+from pyrise import Person, QuerySet
+
+
+@pytest.fixture
+def people(fake):
+    """1200 people, which Highrise returns in three pages"""
+
+    return [fake.add(Person(first_name='Ada{}'.format(i), last_name='Lovelace')) for i in range(1200)]
+
+
+def requests_made(fake, queryset, use):
+    before = len(fake.requests)
+    result = use(queryset)
+    return result, len(fake.requests) - before
+
+
+def test_no_request_until_results_are_needed(fake, people):
+    queryset = Person.all()
+    assert isinstance(queryset, QuerySet)
+    assert fake.requests == []
+
+
+def test_pages_are_fetched_as_they_are_used(fake, people):
+    queryset = Person.all()
+
+    assert requests_made(fake, queryset, lambda q: q[0].id) == (people[0].id, 1)
+    assert requests_made(fake, queryset, lambda q: q[499].id) == (people[499].id, 0)
+    assert requests_made(fake, queryset, lambda q: q[500].id) == (people[500].id, 1)
+    assert requests_made(fake, queryset, len) == (1200, 1)
+    assert requests_made(fake, queryset, lambda q: [person.id for person in q]) == ([p.id for p in people], 0)
+
+
+def test_first_and_exists_fetch_at_most_one_page(fake, people):
+    assert requests_made(fake, Person.all(), lambda q: q.first().id) == (people[0].id, 1)
+    assert requests_made(fake, Person.all(), bool) == (True, 1)
+
+
+def test_empty_results(fake):
+    queryset = Person.all()
+    assert queryset.first() is None
+    assert not queryset.exists()
+    assert len(queryset) == 0
+    assert queryset[:10] == []
+
+
+def test_slices_start_at_the_offset(fake, people):
+    page = Person.all()[600:610]
+    assert isinstance(page, QuerySet)
+    assert fake.requests == []
+
+    assert requests_made(fake, page, lambda q: [person.id for person in q]) == ([p.id for p in people[600:610]], 1)
+
+
+def test_slices_of_slices(fake, people):
+    queryset = Person.all()[100:]
+    assert [person.id for person in queryset[:3]] == [p.id for p in people[100:103]]
+    assert len(queryset[1000:]) == 100
+    assert [person.id for person in Person.all()[:10][5:]] == [p.id for p in people[5:10]]
+    assert len(Person.all()[10:][:700]) == 700
+    assert len(Person.all()[1100:2000]) == 100
+    assert list(Person.all()[5:5]) == []
+
+
+def test_slices_of_fetched_results_come_from_the_cache(fake, people):
+    queryset = Person.all()
+    queryset.first()
+
+    assert requests_made(fake, queryset, lambda q: [person.id for person in q[:20]]) == ([p.id for p in people[:20]], 0)
+
+
+def test_negative_indexes_and_steps(fake, people):
+    assert Person.all()[-1].id == people[-1].id
+    assert [person.id for person in Person.all()[:6:2]] == [p.id for p in people[:6:2]]
+
+
+def test_iterator_streams_every_page(fake, people):
+    ids, requests = requests_made(fake, Person.all(), lambda q: [person.id for person in q.iterator()])
+    assert ids == [p.id for p in people]
+    assert requests == 3
+
+    assert [person.id for person in Person.all()[498:503].iterator()] == [p.id for p in people[498:503]]
+
+
+def test_a_full_last_page_needs_one_more_request(fake, people):
+    assert requests_made(fake, Person.all()[200:], len) == (1000, 3)
@@ -0,0 +1,126 @@
+from pyrise import ContactData, EmailAddress, IdentityMap, Person, PhoneNumber
+
+
+def saved_person(**kwargs):
+    person = Person(first_name='Ada', last_name='Lovelace', **kwargs)
+    person.save()
+    return person
+
+
+def test_create_takes_the_new_record(fake):
+    person = saved_person()
+
+    assert fake.requests == [('POST', '/people.xml')]
+    assert person.id is not None
+    assert person.created_at is not None
+    assert person.changed_fields() == []
+    assert not person.stale
+
+
+def test_new_objects_have_no_changed_fields():
+    assert Person(first_name='Ada').changed_fields() is None
+
+
+def test_saving_an_unchanged_object_makes_no_request(fake):
+    person = saved_person()
+    person.save()
+    Person.get(person.id).save()
+
+    assert fake.requests == [('POST', '/people.xml'), ('GET', '/people/{}.xml'.format(person.id))]
+
+
+def test_only_changed_fields_are_sent(fake):
+    person = saved_person(contact_data=ContactData(email_addresses=[EmailAddress(address='ada@example.com')]))
+    person = Person.get(person.id)
+
+    person.title = 'Countess'
+    assert person.changed_fields() == ['title']
+    assert b'<title>Countess</title>' in person._save_body()
+    assert b'first-name' not in person._save_body()
+
+    person.contact_data.phone_numbers.append(PhoneNumber(number='555-0100'))
+    assert sorted(person.changed_fields()) == ['contact_data', 'title']
+    body = person._save_body()
+    assert b'555-0100' in body
+    assert b'ada@example.com' not in body
+
+
+def test_changing_a_child_object_changes_its_field(fake):
+    person = saved_person(contact_data=ContactData(email_addresses=[EmailAddress(address='ada@example.com')]))
+
+    person.contact_data.email_addresses[0].address = 'countess@example.com'
+    assert person.changed_fields() == ['contact_data']
+
+    person.save(refetch=False)
+    assert person.changed_fields() == []
+    assert Person.get(person.id).contact_data.email_addresses[0].address == 'countess@example.com'
+
+
+def test_update_keeps_the_values_sent_and_marks_the_object_stale(fake):
+    person = saved_person()
+    person.title = 'Countess'
+    person.save()
+
+    assert fake.requests[1:] == [('PUT', '/people/{}.xml'.format(person.id))]
+    assert person.stale
+    assert person.title == 'Countess'
+    assert person.changed_fields() == []
+
+    person.refresh()
+    assert not person.stale
+
+
+def test_refetch_true_requests_the_object_again(fake):
+    person = saved_person()
+    person.title = 'Countess'
+    person.save(refetch=True)
+
+    assert fake.requests[1:] == [('PUT', '/people/{0}.xml'.format(person.id)), ('GET', '/people/{0}.xml'.format(person.id))]
+    assert not person.stale
+    assert person.title == 'Countess'
+
+
+def test_new_children_are_refetched_for_their_ids(fake):
+    person = saved_person()
+    person.contact_data.phone_numbers.append(PhoneNumber(number='555-0100'))
+    person.save()
+
+    assert fake.requests[-1] == ('GET', '/people/{}.xml'.format(person.id))
+    assert person.contact_data.phone_numbers[0].id is not None
+    assert person.changed_fields() == []
+
+
+def test_new_children_are_not_created_again_by_later_saves(fake):
+    for refetch in (False, 'defer'):
+        person = saved_person()
+        person.contact_data.phone_numbers.append(PhoneNumber(number='555-0100'))
+        person.save(refetch=refetch)
+        assert person.changed_fields() == []
+
+        person.title = 'Countess'
+        person.save(refetch=refetch)
+        person.background = 'Mathematician'
+        person.save(refetch=refetch)
+
+        assert [phone.number for phone in Person.get(person.id).contact_data.phone_numbers] == ['555-0100']
+
+
+def test_deferred_saves_are_refreshed_together(fake):
+    people = [saved_person() for _ in range(3)]
+    for person in people:
+        person.title = 'Countess'
+        person.save(refetch='defer')
+    assert all(person.stale for person in people)
+
+    assert Person.refresh_many(people) == {}
+    assert not any(person.stale for person in people)
+    assert [person.title for person in people] == ['Countess'] * 3
+
+
+def test_saved_objects_stay_the_identity_maps_object(fake):
+    person = saved_person()
+    with IdentityMap():
+        loaded = Person.get(person.id)
+        loaded.title = 'Countess'
+        loaded.save(refetch=True)
+        assert Person.get(person.id) is loaded